@@ -1,14 +1,86 @@
-from django.contrib import admin
-from .models import Product, Warehouse, WarehouseProduct, Order, OrderItem
+from django import forms
+from django.contrib import admin, messages
+from .models import (
+    Product, Warehouse, WarehouseProduct, Order, OrderItem, StockMovement
+)
+from .pagination import EstimatedCountPaginator
+from .search import matching_product_ids
+from .stock import (
+    InsufficientStockError, StockLevelError, add_order_item, complete_orders
+)
+
+
+class InputFilter(admin.SimpleListFilter):
+    """Фильтр боковой панели с полем ввода вместо списка всех значений.
+
+    Стандартный фильтр по внешнему ключу загружает в панель всю связанную
+    таблицу; здесь значение вводится вручную.
+    """
+    template = 'inventory_management/admin_input_filter.html'
+
+    def lookups(self, request, model_admin):
+        # Фильтр показывается, только если есть хотя бы один вариант
+        return ((None, None),)
+
+    def choices(self, changelist):
+        # Остальные параметры списка передаются формой в скрытых полях
+        all_choice = next(super().choices(changelist))
+        all_choice['query_parts'] = [
+            (key, value)
+            for key, values in changelist.get_filters_params().items()
+            if key != self.parameter_name
+            for value in values
+        ]
+        yield all_choice
+
+
+class OrderFilter(InputFilter):
+    title = 'номеру заказа'
+    parameter_name = 'order'
+
+    def queryset(self, request, queryset):
+        value = self.value()
+        if value is not None:
+            if not value.strip().isdigit():
+                return queryset.none()
+            return queryset.filter(order_id=int(value))
+
+
+class ProductFilter(InputFilter):
+    """Продукт ищется по полнотекстовому индексу, как в поиске продуктов."""
+    title = 'продукту'
+    parameter_name = 'product'
+
+    def queryset(self, request, queryset):
+        value = self.value()
+        if value:
+            matching = matching_product_ids(value)
+            if matching is None:
+                return queryset.filter(product__name__icontains=value)
+            return queryset.filter(product_id__in=matching)
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Список по большой таблице: без второго ``COUNT(*)`` по всей таблице
+    и с оценкой общего числа строк, пока список не отфильтрован."""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
-    list_display = ('name', 'price', 'created_at', 'updated_at')
+class ProductAdmin(LargeTableAdmin):
+    list_display = ('name', 'sku', 'price', 'created_at', 'updated_at')
     search_fields = ('name', 'description')
     list_filter = ('created_at', 'updated_at')
     ordering = ('-created_at',)
 
+    def get_search_results(self, request, queryset, search_term):
+        """Поиск по полнотекстовому индексу вместо ``LIKE '%...%'``."""
+        matching = matching_product_ids(search_term)
+        if matching is None:
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(pk__in=matching), False
+
 
 @admin.register(Warehouse)
 class WarehouseAdmin(admin.ModelAdmin):
@@ -17,31 +89,114 @@ class WarehouseAdmin(admin.ModelAdmin):
 
 
 @admin.register(WarehouseProduct)
-class WarehouseProductAdmin(admin.ModelAdmin):
-    list_display = ('warehouse', 'product', 'quantity')
+class WarehouseProductAdmin(LargeTableAdmin):
+    list_display = (
+        'warehouse', 'product', 'quantity', 'reserved', 'reorder_level', 'is_low_stock'
+    )
     search_fields = ('warehouse__name', 'product__name')
-    list_filter = ('warehouse', 'product')
+    list_filter = ('warehouse', 'is_low_stock', ProductFilter)
+    list_select_related = ('warehouse', 'product')
+    autocomplete_fields = ('warehouse', 'product')
 
 
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
+class OrderAdmin(LargeTableAdmin):
     list_display = ('id', 'status', 'created_at', 'updated_at', 'total_price')
     list_filter = ('status', 'created_at')
+    # Нужен для автодополнения заказа в формах позиций и движений
+    search_fields = ('=id',)
     ordering = ('-created_at',)
+    actions = ('complete_selected',)
+
+    def get_readonly_fields(self, request, obj=None):
+        # Смена статуса списывает или возвращает товар: она выполняется на
+        # странице заказа или действием, а не простым сохранением формы
+        if obj is not None:
+            return ('status',)
+        return ()
+
+    @admin.action(description='Завершить выбранные заказы')
+    def complete_selected(self, request, queryset):
+        """Завершает выбранные заказы одной транзакцией со списанием резерва."""
+        try:
+            completed = complete_orders(queryset.values_list('pk', flat=True))
+        except StockLevelError as error:
+            self.message_user(request, str(error), messages.ERROR)
+        else:
+            self.message_user(request, f'Завершено заказов: {completed}')
 
     def total_price(self, obj):
-        """Отображает общую стоимость заказа."""
-        return obj.total_price()
+        """Отображает общую стоимость заказа (денормализованное поле)."""
+        return obj.total
     total_price.short_description = 'Общая стоимость'
+    total_price.admin_order_field = 'total'
+
+
+class OrderItemAdminForm(forms.ModelForm):
+    def clean(self):
+        cleaned_data = super().clean()
+        order = cleaned_data.get('order')
+        product = cleaned_data.get('product')
+        warehouse = cleaned_data.get('warehouse')
+        quantity = cleaned_data.get('quantity')
+        if self.instance.pk is None and order and product and warehouse and quantity:
+            row = WarehouseProduct.objects.filter(
+                warehouse=warehouse, product=product
+            ).first()
+            available = row.available if row else 0
+            if quantity > available:
+                raise forms.ValidationError(
+                    str(InsufficientStockError(product, quantity, available))
+                )
+        return cleaned_data
 
 
 @admin.register(OrderItem)
-class OrderItemAdmin(admin.ModelAdmin):
-    list_display = ('order', 'product', 'quantity', 'total_price')
-    search_fields = ('order__id', 'product__name')
-    list_filter = ('order',)
+class OrderItemAdmin(LargeTableAdmin):
+    list_display = ('order', 'product', 'warehouse', 'quantity', 'total_price')
+    search_fields = ('=order__id', 'product__name')
+    list_filter = ('order__status', 'warehouse', OrderFilter, ProductFilter)
+    list_select_related = ('order', 'product', 'warehouse')
+    autocomplete_fields = ('order', 'product', 'warehouse')
+    form = OrderItemAdminForm
+
+    def get_readonly_fields(self, request, obj=None):
+        # Резерв и списание позиции меняются только через stock.py
+        if obj is not None:
+            return ('order', 'product', 'warehouse', 'quantity')
+        return ()
+
+    def save_model(self, request, obj, form, change):
+        """Новая позиция резервирует (или списывает) товар на складе."""
+        if change:
+            super().save_model(request, obj, form, change)
+        else:
+            add_order_item(obj)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_totals()
 
     def total_price(self, obj):
         """Отображает стоимость этой позиции в заказе."""
         return obj.total_price()
     total_price.short_description = 'Стоимость позиции'
+    total_price.admin_order_field = 'line_total'
+
+
+@admin.register(StockMovement)
+class StockMovementAdmin(LargeTableAdmin):
+    """Журнал движения товаров: только просмотр, записи не изменяются."""
+    list_display = ('created_at', 'kind', 'warehouse', 'product', 'quantity', 'order')
+    list_filter = ('kind', 'warehouse', OrderFilter, ProductFilter)
+    list_select_related = ('warehouse', 'product', 'order')
+    search_fields = ('product__name', 'warehouse__name')
+    ordering = ('-created_at', '-id')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
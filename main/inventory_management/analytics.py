@@ -0,0 +1,363 @@
+import operator
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from functools import reduce
+
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, F, Q, Sum, Value, When
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import CENTS, DailyOrderStats, DailyWarehouseStats, Order, OrderItem
+
+# Итоги дня: (orders, units, revenue)
+ORDER_FIELDS = ("orders", "units", "revenue")
+ZERO = (0, 0, Decimal("0"))
+
+# Сколько строк-итогов меняется одним UPDATE: условие и CASE растут с
+# каждым ключом, а глубина выражения в SQLite ограничена
+INCREMENT_BATCH_SIZE = 200
+
+ANALYTICS_BATCH_SIZE = 2000
+
+# Самый длинный диапазон графика (10 лет)
+MAX_RANGE_DAYS = 3660
+
+# Итоги заказов и их позиций в полях ORDER_FIELDS
+ORDER_AGGREGATES = {
+    "orders": Count("pk", distinct=True),
+    "units": Coalesce(Sum("items__quantity"), 0),
+    "revenue": Coalesce(
+        Sum(F("items__quantity") * F("items__product__price")),
+        Value(Decimal("0")),
+        output_field=DecimalField(max_digits=14, decimal_places=2),
+    ),
+}
+ITEM_AGGREGATES = {
+    "orders": Count("order", distinct=True),
+    "units": Sum("quantity"),
+    "revenue": Sum(F("quantity") * F("product__price")),
+}
+
+
+def _empty(model, fields):
+    """Условие пустой строки-итога: нулевые счётчики.
+
+    Денежные поля не проверяются: в SQLite арифметика над ними идёт в
+    плавающей точке и может оставить остаток вроде ``-0.00``.
+    """
+    return {
+        field: 0
+        for field in fields
+        if not isinstance(model._meta.get_field(field), DecimalField)
+    }
+
+
+def increment_rows(model, keys, fields, deltas, **filters):
+    """Прибавляет значения к строкам-итогам ``model``.
+
+    ``deltas`` — ``{значения полей keys: приращения полей fields}``,
+    ``filters`` — значения, общие для всех строк. Недостающие строки
+    создаются одним INSERT, значения меняются одним ``UPDATE ... CASE``
+    через ``F() + delta``, поэтому параллельные изменения складываются, а не
+    перезаписывают друг друга. Обнулившиеся строки удаляются.
+    """
+    changes = [(key, delta) for key, delta in deltas.items() if any(delta)]
+    with transaction.atomic():
+        for start in range(0, len(changes), INCREMENT_BATCH_SIZE):
+            batch = changes[start : start + INCREMENT_BATCH_SIZE]
+            matches = [Q(**dict(zip(keys, key))) for key, _ in batch]
+            model.objects.bulk_create(
+                [model(**dict(zip(keys, key)), **filters) for key, _ in batch],
+                ignore_conflicts=True,
+            )
+            rows = model.objects.filter(reduce(operator.or_, matches), **filters)
+            # Одно F() + CASE на поле и значения с готовым типом: Django не
+            # выводит тип выражения заново в каждой ветке
+            output_fields = [model._meta.get_field(field) for field in fields]
+            rows.update(
+                **{
+                    field: F(field)
+                    + Case(
+                        *[
+                            When(match, then=Value(delta[index], output_field=output))
+                            for match, (_, delta) in zip(matches, batch)
+                        ],
+                        default=Value(0, output_field=output),
+                        output_field=output,
+                    )
+                    for index, (field, output) in enumerate(zip(fields, output_fields))
+                }
+            )
+            rows.filter(**_empty(model, fields)).delete()
+
+
+def order_day(created_at):
+    """День, на который заказ попадает в итоги (в часовом поясе проекта)."""
+    return timezone.localdate(created_at)
+
+
+def _add(deltas, key, values, sign=1):
+    deltas[key] = tuple(
+        total + sign * value for total, value in zip(deltas.get(key, ZERO), values)
+    )
+
+
+def _apply(order_deltas, warehouse_deltas):
+    """``order_deltas`` — по ``(day, status)``, ``warehouse_deltas`` — по
+    ``(warehouse_id, day, status)``."""
+    increment_rows(DailyOrderStats, ("day", "status"), ORDER_FIELDS, order_deltas)
+    increment_rows(
+        DailyWarehouseStats,
+        ("warehouse_id", "day", "status"),
+        ORDER_FIELDS,
+        warehouse_deltas,
+    )
+
+
+def _warehouse_totals(order_id, warehouse_ids=None):
+    """Позиции заказа по складам: ``{warehouse_id: (units, revenue)}``."""
+    items = OrderItem.objects.filter(order_id=order_id)
+    if warehouse_ids is not None:
+        items = items.filter(warehouse_id__in=warehouse_ids)
+    return {
+        warehouse_id: (units, revenue)
+        for warehouse_id, units, revenue in items.values_list("warehouse")
+        .annotate(
+            units=Sum("quantity"),
+            revenue=Sum(F("quantity") * F("product__price")),
+        )
+        .order_by()
+    }
+
+
+def _order_rows(orders, *fields):
+    """Итоги заказов по дню создания (и полям ``fields``):
+    ``(day, *fields, orders, units, revenue)``."""
+    return (
+        orders.annotate(day=TruncDate("created_at"))
+        .values_list("day", *fields)
+        .annotate(**ORDER_AGGREGATES)
+        .order_by()
+    )
+
+
+def _warehouse_rows(items, *fields):
+    """Итоги позиций по складу и дню заказа (и полям ``fields``):
+    ``(warehouse_id, day, *fields, orders, units, revenue)``."""
+    return (
+        items.filter(warehouse__isnull=False)
+        .annotate(day=TruncDate("order__created_at"))
+        .values_list("warehouse", "day", *fields)
+        .annotate(**ITEM_AGGREGATES)
+        .order_by()
+    )
+
+
+def _record_orders(order_ids, changes, count_orders=True):
+    """Добавляет вклад заказов ``order_ids`` под статусами из ``changes``
+    (пары ``(status, sign)``); итоги читаются двумя сгруппированными
+    запросами независимо от числа заказов."""
+    order_deltas = {}
+    warehouse_deltas = {}
+    for day, orders, units, revenue in _order_rows(
+        Order.objects.filter(pk__in=order_ids)
+    ):
+        for status, sign in changes:
+            _add(
+                order_deltas,
+                (day, status),
+                (orders if count_orders else 0, units, revenue),
+                sign,
+            )
+    for warehouse_id, day, orders, units, revenue in _warehouse_rows(
+        OrderItem.objects.filter(order_id__in=order_ids)
+    ):
+        for status, sign in changes:
+            _add(
+                warehouse_deltas,
+                (warehouse_id, day, status),
+                (orders, units, revenue),
+                sign,
+            )
+    _apply(order_deltas, warehouse_deltas)
+
+
+def move_orders(order_ids, old_status, new_status):
+    """Переносит заказы в итогах из статуса ``old_status`` в ``new_status``.
+
+    ``None`` вместо статуса — заказов нет (до создания или после удаления).
+    Число запросов не зависит от числа заказов.
+    """
+    _record_orders(
+        order_ids,
+        [
+            (status, sign)
+            for status, sign in ((old_status, -1), (new_status, 1))
+            if status is not None
+        ],
+    )
+
+
+def record_new_items(order):
+    """Учитывает позиции, вставленные ``bulk_create`` (без сигналов).
+
+    Сам заказ уже учтён сигналом при создании, добавляются только позиции.
+    """
+    _record_orders([order.pk], [(order.status, 1)], count_orders=False)
+
+
+def record_order_item_change(previous, current):
+    """Учитывает изменение позиции заказа в итогах.
+
+    ``previous`` и ``current`` — кортежи ``(order_id, warehouse_id, quantity,
+    price)`` до и после изменения (``None``, если позиции не было). Итоги
+    склада до изменения восстанавливаются из текущих, поэтому заказ с
+    несколькими позициями одного склада считается на складе один раз.
+    """
+    lines = [line for line in (previous, current) if line is not None]
+    orders = Order.objects.filter(pk__in={line[0] for line in lines}).values_list(
+        "pk", "status", "created_at"
+    )
+    order_deltas = {}
+    warehouse_deltas = {}
+    for order_id, status, created_at in orders:
+        day = order_day(created_at)
+        changes = [
+            (line, sign)
+            for line, sign in ((previous, -1), (current, 1))
+            if line is not None and line[0] == order_id
+        ]
+        for (_, _, quantity, price), sign in changes:
+            _add(order_deltas, (day, status), (0, quantity, quantity * price), sign)
+
+        warehouse_ids = {line[1] for line, _ in changes if line[1] is not None}
+        after = _warehouse_totals(order_id, warehouse_ids)
+        before = dict(after)
+        for (_, warehouse_id, quantity, price), sign in changes:
+            if warehouse_id is not None:
+                # До изменения: без новой позиции и со старой
+                _add(before, warehouse_id, (quantity, quantity * price), -sign)
+        for warehouse_id in warehouse_ids:
+            new = after.get(warehouse_id, ZERO[1:])
+            old = before.get(warehouse_id, ZERO[1:])
+            _add(
+                warehouse_deltas,
+                (warehouse_id, day, status),
+                (
+                    int(new[0] > 0) - int(old[0] > 0),
+                    new[0] - old[0],
+                    new[1] - old[1],
+                ),
+            )
+    _apply(order_deltas, warehouse_deltas)
+
+
+def record_price_changes(price_deltas):
+    """Пересчитывает выручку после смены цен (``{product_id: разница цены}``).
+
+    Проданные единицы продуктов группируются по дню, статусу и складу одним
+    запросом по индексу позиций, выручка меняется на ``units * разница``.
+    """
+    price_deltas = {
+        product_id: delta for product_id, delta in price_deltas.items() if delta
+    }
+    if not price_deltas:
+        return
+    rows = (
+        OrderItem.objects.filter(product_id__in=price_deltas)
+        .annotate(day=TruncDate("order__created_at"))
+        .values_list("product", "day", "order__status", "warehouse")
+        .annotate(units=Sum("quantity"))
+        .order_by()
+    )
+    order_deltas = {}
+    warehouse_deltas = {}
+    for product_id, day, status, warehouse_id, units in rows:
+        revenue = units * price_deltas[product_id]
+        _add(order_deltas, (day, status), (0, 0, revenue))
+        if warehouse_id is not None:
+            _add(warehouse_deltas, (warehouse_id, day, status), (0, 0, revenue))
+    _apply(order_deltas, warehouse_deltas)
+
+
+def rebuild_order_stats(batch_size=ANALYTICS_BATCH_SIZE):
+    """Пересчитывает дневные итоги заказов и складов с нуля."""
+    orders = _order_rows(Order.objects.all(), "status")
+    warehouses = _warehouse_rows(OrderItem.objects.all(), "order__status")
+    with transaction.atomic():
+        DailyOrderStats.objects.all().delete()
+        DailyWarehouseStats.objects.all().delete()
+        DailyOrderStats.objects.bulk_create(
+            (
+                DailyOrderStats(
+                    day=day, status=status, orders=count, units=units, revenue=revenue
+                )
+                for day, status, count, units, revenue in orders.iterator(
+                    chunk_size=batch_size
+                )
+            ),
+            batch_size=batch_size,
+        )
+        DailyWarehouseStats.objects.bulk_create(
+            (
+                DailyWarehouseStats(
+                    warehouse_id=warehouse_id,
+                    day=day,
+                    status=status,
+                    orders=count,
+                    units=units,
+                    revenue=revenue,
+                )
+                for warehouse_id, day, status, count, units, revenue in (
+                    warehouses.iterator(chunk_size=batch_size)
+                )
+            ),
+            batch_size=batch_size,
+        )
+
+
+def year_earlier(day):
+    """Тот же день годом раньше (29 февраля — 28 февраля)."""
+    try:
+        return day.replace(year=day.year - 1)
+    except ValueError:
+        return day.replace(year=day.year - 1, day=28)
+
+
+def daily_series(start, end, status=None, warehouse_id=None):
+    """Итоги по дням с ``start`` по ``end`` включительно.
+
+    Читается только диапазон индекса итоговой таблицы; дни без заказов
+    заполняются нулями, чтобы график не имел разрывов.
+    """
+    if warehouse_id is None:
+        rows = DailyOrderStats.objects.all()
+    else:
+        rows = DailyWarehouseStats.objects.filter(warehouse_id=warehouse_id)
+    if status:
+        rows = rows.filter(status=status)
+    totals = {
+        day: values
+        for day, *values in rows.filter(day__range=(start, end))
+        .values_list("day")
+        .annotate(Sum("orders"), Sum("units"), Sum("revenue"))
+        .order_by()
+    }
+
+    series = defaultdict(list)
+    day = start
+    while day <= end:
+        orders, units, revenue = totals.get(day, ZERO)
+        series["days"].append(day)
+        series["orders"].append(orders)
+        series["units"].append(units)
+        series["revenue"].append(Decimal(revenue).quantize(CENTS))
+        day += timedelta(days=1)
+    series["totals"] = {
+        "orders": sum(series["orders"]),
+        "units": sum(series["units"]),
+        "revenue": sum(series["revenue"], Decimal("0")),
+    }
+    return dict(series)
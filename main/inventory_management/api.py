@@ -0,0 +1,304 @@
+import hashlib
+import json
+from datetime import datetime, time
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.exceptions import BadRequest
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Max, Prefetch, Sum
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_date, parse_datetime
+from django.views import View
+
+from .models import (
+    Order,
+    OrderItem,
+    Product,
+    StockMovement,
+    Warehouse,
+    WarehouseProduct,
+)
+
+# Сколько строк читается из БД за раз; память не зависит от размера выборки
+API_CHUNK_SIZE = 500
+
+
+def stream_json(rows):
+    """Отдаёт ``{"results": [...]}`` по частям, не собирая список в памяти."""
+    encoder = DjangoJSONEncoder(ensure_ascii=False, separators=(",", ":"))
+    yield '{"results":['
+    buffer = []
+    for index, row in enumerate(rows):
+        buffer.append(("," if index else "") + encoder.encode(row))
+        if len(buffer) >= API_CHUNK_SIZE:
+            yield "".join(buffer)
+            buffer = []
+    buffer.append("]}")
+    yield "".join(buffer)
+
+
+async def astream_json(rows):
+    """Асинхронная версия ``stream_json()`` для ASGI.
+
+    Каждая часть ответа готовится в потоке запроса через ``sync_to_async``;
+    синхронный итератор Django под ASGI собрал бы весь ответ в память.
+    """
+    chunks = stream_json(rows)
+    next_chunk = sync_to_async(next)
+    while (chunk := await next_chunk(chunks, None)) is not None:
+        yield chunk
+
+
+def _parse_moment(value, end_of_day=False):
+    """Дата (``2026-01-31``) или дата-время в ISO 8601 из параметра запроса."""
+    try:
+        moment = parse_datetime(value)
+        if moment is None:
+            day = parse_date(value)
+            if day is None:
+                raise ValueError
+            moment = datetime.combine(day, time.max if end_of_day else time.min)
+    except ValueError:
+        raise BadRequest(f"Некорректная дата: {value}")
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def _parse_id(value, name):
+    try:
+        return int(value)
+    except ValueError:
+        raise BadRequest(f"Некорректный параметр {name}: {value}")
+
+
+class StreamingListView(LoginRequiredMixin, View):
+    """Базовое представление API: потоковая выдача списка в JSON.
+
+    ``fields`` — словарь ``{поле ответа: (колонки модели, функция)}``;
+    клиент выбирает поля параметром ``?fields=a,b``. Строки читаются через
+    ``iterator(chunk_size=...)`` (префетч выполняется для каждой пачки),
+    ETag считается по агрегатам выборки, без чтения самих строк.
+    """
+
+    raise_exception = True
+    fields = {}
+    default_fields = ()
+
+    def get_queryset(self, request, fields):
+        raise NotImplementedError
+
+    def fingerprint(self, queryset, fields):
+        """Значения, которые меняются при любом изменении отдаваемых данных."""
+        raise NotImplementedError
+
+    def get(self, request):
+        fields = self.selected_fields(request)
+        queryset = self.get_queryset(request, fields)
+
+        params = sorted(request.GET.lists())
+        payload = json.dumps(
+            [type(self).__name__, params, self.fingerprint(queryset, fields)],
+            cls=DjangoJSONEncoder,
+        )
+        etag = f'W/"{hashlib.sha1(payload.encode()).hexdigest()}"'
+        response = get_conditional_response(request, etag=etag)
+        if response is not None:
+            return response
+
+        # Под ASGI нужен асинхронный итератор, под WSGI — синхронный
+        stream = astream_json if isinstance(request, ASGIRequest) else stream_json
+        response = StreamingHttpResponse(
+            stream(self.rows(queryset, fields)), content_type="application/json"
+        )
+        response["ETag"] = etag
+        return response
+
+    def rows(self, queryset, fields):
+        columns = {"pk"}
+        for name in fields:
+            columns.update(self.fields[name][0])
+        for obj in queryset.only(*columns).iterator(chunk_size=API_CHUNK_SIZE):
+            yield {name: self.fields[name][1](obj) for name in fields}
+            # Предзагруженные объекты ссылаются на родителя; без разрыва цикла
+            # пачки освобождал бы только сборщик циклов, и память росла бы
+            obj._prefetched_objects_cache = {}
+
+    def selected_fields(self, request):
+        raw = request.GET.get("fields")
+        if not raw:
+            return list(self.default_fields)
+        fields = [name.strip() for name in raw.split(",") if name.strip()]
+        unknown = sorted(set(fields) - set(self.fields))
+        if unknown:
+            raise BadRequest(f"Неизвестные поля: {', '.join(unknown)}")
+        return fields
+
+
+class ProductListApiView(StreamingListView):
+    """Продукты с остатками по складам; фильтр ``?warehouse=<id>``."""
+
+    fields = {
+        "id": ((), lambda product: product.pk),
+        "name": (("name",), lambda product: product.name),
+        "description": (("description",), lambda product: product.description),
+        "price": (("price",), lambda product: product.price),
+        "created_at": (("created_at",), lambda product: product.created_at),
+        "updated_at": (("updated_at",), lambda product: product.updated_at),
+        "stock": (
+            (),
+            lambda product: [
+                {
+                    "warehouse_id": row.warehouse_id,
+                    "quantity": row.quantity,
+                    "reserved": row.reserved,
+                }
+                for row in product.warehouse_products.all()
+            ],
+        ),
+    }
+    default_fields = ("id", "name", "price", "stock")
+
+    def get_queryset(self, request, fields):
+        queryset = Product.objects.order_by("pk")
+        if request.GET.get("warehouse"):
+            warehouse_id = _parse_id(request.GET["warehouse"], "warehouse")
+            queryset = queryset.filter(warehouse_products__warehouse_id=warehouse_id)
+        if "stock" in fields:
+            queryset = queryset.prefetch_related(
+                Prefetch(
+                    "warehouse_products",
+                    queryset=WarehouseProduct.objects.only(
+                        "product_id", "warehouse_id", "quantity", "reserved"
+                    ).order_by("warehouse_id"),
+                )
+            )
+        return queryset
+
+    def fingerprint(self, queryset, fields):
+        values = queryset.aggregate(count=Count("pk"), updated=Max("updated_at"))
+        if "stock" in fields:
+            # Остатки и резерв меняются без изменения продукта, но каждая
+            # запись строки остатка увеличивает её версию: сумма версий только
+            # растёт, а удаление и вставку видно по числу строк и Max(pk)
+            values["stock"] = WarehouseProduct.objects.aggregate(
+                count=Count("pk"), last=Max("pk"), version=Sum("version")
+            )
+        return values
+
+
+class OrderListApiView(StreamingListView):
+    """Заказы с позициями; фильтры ``status``, ``created_after``,
+    ``created_before`` и ``warehouse`` (заказы с позициями с этого склада).
+    """
+
+    fields = {
+        "id": ((), lambda order: order.pk),
+        "status": (("status",), lambda order: order.status),
+        "total": (("total",), lambda order: order.total),
+        "created_at": (("created_at",), lambda order: order.created_at),
+        "updated_at": (("updated_at",), lambda order: order.updated_at),
+        "items": (
+            (),
+            lambda order: [
+                {
+                    "product_id": item.product_id,
+                    "warehouse_id": item.warehouse_id,
+                    "quantity": item.quantity,
+                    "total": item.line_total,
+                }
+                for item in order.items.all()
+            ],
+        ),
+    }
+    default_fields = ("id", "status", "total", "created_at", "items")
+
+    def get_queryset(self, request, fields):
+        queryset = Order.objects.order_by("pk")
+        status = request.GET.get("status")
+        if status:
+            if status not in dict(Order._meta.get_field("status").choices):
+                raise BadRequest(f"Неизвестный статус заказа: {status}")
+            queryset = queryset.filter(status=status)
+        if request.GET.get("created_after"):
+            queryset = queryset.filter(
+                created_at__gte=_parse_moment(request.GET["created_after"])
+            )
+        if request.GET.get("created_before"):
+            queryset = queryset.filter(
+                created_at__lte=_parse_moment(
+                    request.GET["created_before"], end_of_day=True
+                )
+            )
+        if request.GET.get("warehouse"):
+            warehouse_id = _parse_id(request.GET["warehouse"], "warehouse")
+            queryset = queryset.filter(
+                pk__in=OrderItem.objects.filter(warehouse_id=warehouse_id).values(
+                    "order_id"
+                )
+            )
+        if "items" in fields:
+            queryset = queryset.prefetch_related(
+                Prefetch(
+                    "items",
+                    queryset=OrderItem.objects.with_totals()
+                    .only("order_id", "product_id", "warehouse_id", "quantity")
+                    .order_by("pk"),
+                )
+            )
+        return queryset
+
+    def fingerprint(self, queryset, fields):
+        # Версии растут при каждой записи заказа и позиции; total — поле
+        # производное (меняется и с ценой продукта), версию он не трогает
+        values = queryset.aggregate(
+            count=Count("pk"),
+            last=Max("pk"),
+            version=Sum("version"),
+            total=Sum("total"),
+        )
+        if "items" in fields:
+            values["items"] = OrderItem.objects.filter(order__in=queryset).aggregate(
+                count=Count("pk"), last=Max("pk"), version=Sum("version")
+            )
+        return values
+
+
+class WarehouseListApiView(StreamingListView):
+    """Склады с итогами по остаткам."""
+
+    fields = {
+        "id": ((), lambda warehouse: warehouse.pk),
+        "name": (("name",), lambda warehouse: warehouse.name),
+        "location": (("location",), lambda warehouse: warehouse.location),
+        "updated_at": (("updated_at",), lambda warehouse: warehouse.updated_at),
+        "total_quantity": ((), lambda warehouse: warehouse.total_quantity),
+        "sku_count": ((), lambda warehouse: warehouse.sku_count),
+        "stock_value": ((), lambda warehouse: warehouse.stock_value),
+    }
+    default_fields = tuple(fields)
+
+    TOTAL_FIELDS = {"total_quantity", "sku_count", "stock_value"}
+
+    def get_queryset(self, request, fields):
+        queryset = Warehouse.objects.order_by("pk")
+        if self.TOTAL_FIELDS & set(fields):
+            queryset = queryset.with_stock_totals()
+        return queryset
+
+    def fingerprint(self, queryset, fields):
+        values = Warehouse.objects.aggregate(
+            count=Count("pk"), updated=Max("updated_at")
+        )
+        if self.TOTAL_FIELDS & set(fields):
+            # Стоимость остатков зависит и от движения товара, и от цен
+            values["movement"] = StockMovement.objects.aggregate(last=Max("pk"))["last"]
+            values["stock"] = WarehouseProduct.objects.count()
+            values["prices"] = Product.objects.aggregate(updated=Max("updated_at"))[
+                "updated"
+            ]
+        return values
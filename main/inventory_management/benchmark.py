@@ -0,0 +1,115 @@
+import statistics
+import time
+import tracemalloc
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .models import Order, Product, Warehouse
+
+# Максимальное число SQL-запросов на страницу. Бюджет не зависит от объёма
+# данных: рост числа запросов вместе с числом строк означает N+1
+QUERY_BUDGETS = {
+    "inventory_management:main": 3,
+    "inventory_management:orders": 4,
+    "inventory_management:order": 4,
+    "inventory_management:create_order": 3,
+    "inventory_management:products": 4,
+    "inventory_management:product": 6,
+    "inventory_management:create_product": 2,
+    "inventory_management:warehouses": 4,
+    "inventory_management:warehouse": 3,
+    "inventory_management:low_stock": 4,
+    "inventory_management:top_products": 4,
+    "inventory_management:analytics": 3,
+    "inventory_management:analytics_api": 3,
+    "inventory_management:product_search": 4,
+    "inventory_management:product_search_api": 4,
+    "inventory_management:import": 2,
+    "admin:index": 3,
+    "admin:inventory_management_product_changelist": 5,
+    "admin:inventory_management_warehouse_changelist": 5,
+    "admin:inventory_management_warehouseproduct_changelist": 7,
+    "admin:inventory_management_order_changelist": 5,
+    "admin:inventory_management_orderitem_changelist": 6,
+    "admin:inventory_management_stockmovement_changelist": 5,
+    "admin:inventory_management_order_change": 6,
+}
+
+# Кеш-заглушка вместо кеша фрагментов: страницы выполняют все свои запросы
+NO_FRAGMENT_CACHE = {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}
+
+# Поисковый запрос для страниц поиска: префикс, встречающийся в тестовых данных
+SEARCH_QUERY = "кирп"
+
+
+def benchmark_pages():
+    """Пары (имя URL, адрес) всех страниц, которые проверяет бенчмарк.
+
+    Страницы отдельных объектов открываются для первого объекта в БД;
+    если объектов нет, страница пропускается.
+    """
+    objects = {
+        "order": Order.objects.order_by("pk").values_list("pk", flat=True).first(),
+        "product": Product.objects.order_by("pk").values_list("pk", flat=True).first(),
+        "warehouse": Warehouse.objects.order_by("pk")
+        .values_list("pk", flat=True)
+        .first(),
+    }
+
+    pages = []
+    for name in QUERY_BUDGETS:
+        args = ()
+        if name in (
+            "inventory_management:order",
+            "admin:inventory_management_order_change",
+        ):
+            args = (objects["order"],)
+        elif name == "inventory_management:product":
+            args = (objects["product"],)
+        elif name == "inventory_management:warehouse":
+            args = (objects["warehouse"],)
+        if None in args:
+            continue
+        url = reverse(name, args=args)
+        if name.startswith("inventory_management:product_search"):
+            url += f"?q={SEARCH_QUERY}"
+        pages.append((name, url))
+    return pages
+
+
+def measure(client, url, repeat=1):
+    """Открывает страницу и возвращает число запросов, время и пик памяти.
+
+    Запросы считаются по первому, холодному открытию: повторные попадают
+    в кеш фрагментов и не показывают N+1. Время — медиана ``repeat``
+    запросов; пик памяти снимается отдельным запросом, чтобы трассировка
+    tracemalloc не искажала время.
+    """
+    timings = []
+    queries = None
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            response = client.get(url)
+            timings.append(time.perf_counter() - started)
+        # Следующий запрос очищает журнал соединения, поэтому копируем его сразу
+        if queries is None:
+            queries = context.captured_queries
+
+    tracemalloc.start()
+    try:
+        client.get(url)
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "status": response.status_code,
+        "queries": len(queries),
+        "sql_time": sum(float(query["time"]) for query in queries),
+        "wall_time": statistics.median(timings),
+        "peak_memory": peak_memory,
+        "response_size": len(response.content),
+    }
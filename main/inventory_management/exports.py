@@ -0,0 +1,229 @@
+import csv
+import zlib
+from datetime import date, datetime
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, DecimalField, ExpressionWrapper, F
+
+from .models import CENTS, Order, OrderItem, WarehouseProduct
+
+# Сколько строк читается из курсора за раз. На PostgreSQL ``iterator()``
+# открывает серверный курсор, на SQLite строки читаются через fetchmany —
+# в обоих случаях в памяти держится только одна пачка
+EXPORT_CHUNK_SIZE = 2000
+
+FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+}
+
+
+def _money(expression):
+    return ExpressionWrapper(
+        expression, output_field=DecimalField(max_digits=12, decimal_places=2)
+    )
+
+
+def _orders():
+    return (
+        Order.objects.with_totals()
+        .annotate(item_count=Count("items"))
+        .order_by("pk")
+        .values_list(
+            "pk", "status", "created_at", "updated_at", "item_count", "items_total"
+        )
+    )
+
+
+def _order_items():
+    return (
+        OrderItem.objects.annotate(
+            price=F("product__price"),
+            line_total=_money(F("quantity") * F("product__price")),
+        )
+        .order_by("pk")
+        .values_list(
+            "pk",
+            "order_id",
+            "order__status",
+            "order__created_at",
+            "product_id",
+            "product__name",
+            "warehouse_id",
+            "warehouse__name",
+            "quantity",
+            "price",
+            "line_total",
+        )
+    )
+
+
+def _stock():
+    return (
+        WarehouseProduct.objects.annotate(
+            available=F("quantity") - F("reserved"),
+            stock_value=_money(F("quantity") * F("product__price")),
+        )
+        .order_by("pk")
+        .values_list(
+            "warehouse_id",
+            "warehouse__name",
+            "product_id",
+            "product__name",
+            "quantity",
+            "reserved",
+            "available",
+            "reorder_level",
+            "product__price",
+            "stock_value",
+        )
+    )
+
+
+# Имя выгрузки: (заголовок, функция, возвращающая values_list в том же порядке).
+# Итоги считаются в самом запросе через JOIN, без total_price() на строку
+EXPORTS = {
+    "orders": (
+        ("id", "status", "created_at", "updated_at", "item_count", "total"),
+        _orders,
+    ),
+    "order_items": (
+        (
+            "id",
+            "order_id",
+            "order_status",
+            "order_created_at",
+            "product_id",
+            "product_name",
+            "warehouse_id",
+            "warehouse_name",
+            "quantity",
+            "price",
+            "total",
+        ),
+        _order_items,
+    ),
+    "stock": (
+        (
+            "warehouse_id",
+            "warehouse_name",
+            "product_id",
+            "product_name",
+            "quantity",
+            "reserved",
+            "available",
+            "reorder_level",
+            "price",
+            "stock_value",
+        ),
+        _stock,
+    ),
+}
+
+
+def export_filename(name, export_format, compress=False):
+    filename = f"{name}.{FORMATS[export_format][1]}"
+    return f"{filename}.gz" if compress else filename
+
+
+class _Line:
+    """Файлоподобный объект для ``csv.writer``: возвращает записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+class ExportEncoder:
+    """Превращает пачки строк выгрузки в текст CSV или NDJSON, при
+    необходимости сжатый gzip. Состояние сжатия хранится между пачками,
+    поэтому части ответа складываются в один корректный gzip-поток.
+    """
+
+    def __init__(self, header, export_format="csv", compress=False):
+        if export_format not in FORMATS:
+            raise ValueError(f"Неизвестный формат выгрузки: {export_format}")
+        self.header = header
+        self.format = export_format
+        # wbits=31 — заголовок и контрольная сумма gzip
+        self.compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+        self.csv_writer = csv.writer(_Line())
+        self.json_encoder = DjangoJSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+    def _output(self, text):
+        data = text.encode()
+        if self.compressor is not None:
+            return self.compressor.compress(data)
+        return data
+
+    def _value(self, value):
+        if isinstance(value, Decimal):
+            return value.quantize(CENTS)
+        if isinstance(value, (datetime, date)):
+            return value.isoformat()
+        return value
+
+    def start(self):
+        if self.format == "csv":
+            return self._output(self.csv_writer.writerow(self.header))
+        return b""
+
+    def encode(self, rows):
+        rows = ([self._value(value) for value in row] for row in rows)
+        if self.format == "csv":
+            lines = [self.csv_writer.writerow(row) for row in rows]
+        else:
+            lines = [
+                self.json_encoder.encode(dict(zip(self.header, row))) + "\n"
+                for row in rows
+            ]
+        return self._output("".join(lines))
+
+    def finish(self):
+        if self.compressor is not None:
+            return self.compressor.flush()
+        return b""
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for row in iterable:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _export_chunks(name, chunk_size):
+    _, queryset = EXPORTS[name]
+    return _chunks(queryset().iterator(chunk_size=chunk_size), chunk_size)
+
+
+def stream_export(name, export_format="csv", compress=False, chunk_size=None):
+    """Части выгрузки ``name`` в байтах; память ограничена одной пачкой строк."""
+    chunk_size = chunk_size or EXPORT_CHUNK_SIZE
+    encoder = ExportEncoder(EXPORTS[name][0], export_format, compress)
+    yield encoder.start()
+    for chunk in _export_chunks(name, chunk_size):
+        yield encoder.encode(chunk)
+    yield encoder.finish()
+
+
+async def astream_export(name, export_format="csv", compress=False, chunk_size=None):
+    """Асинхронная версия ``stream_export()`` для ASGI.
+
+    Каждая пачка читается в потоке запроса, так что долгая выгрузка не
+    блокирует цикл событий. ``aiterator()`` не подходит: для ``values_list``
+    он выполняет запрос прямо в цикле событий.
+    """
+    chunk_size = chunk_size or EXPORT_CHUNK_SIZE
+    encoder = ExportEncoder(EXPORTS[name][0], export_format, compress)
+    yield encoder.start()
+    chunks = _export_chunks(name, chunk_size)
+    next_chunk = sync_to_async(next)
+    while (chunk := await next_chunk(chunks, None)) is not None:
+        yield encoder.encode(chunk)
+    yield encoder.finish()
@@ -0,0 +1,85 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from .metrics import registry
+
+# Версия разметки кешированных строк: увеличивается при изменении
+# шаблонов строк, чтобы после выката не отдавались старые фрагменты
+FRAGMENT_VERSION = 2
+
+DEFAULT_FRAGMENT_TIMEOUT = 24 * 60 * 60
+
+
+def _cache():
+    return caches[getattr(settings, "INVENTORY_FRAGMENT_CACHE", "default")]
+
+
+def fragment_key(name, pk):
+    return f"inventory:fragment:{name}:{pk}"
+
+
+def _current(name, stamps, keys, found):
+    """Фрагменты ``{pk: html}``, отрендеренные по текущей версии строки.
+
+    Фрагмент хранится вместе с отметкой версии строки, по которой он
+    отрендерен (``stamps`` — ``{pk: отметка}`` из уже загруженных строк
+    страницы). Фрагмент с другой отметкой — промах: его мог сохранить
+    запрос, прочитавший строку до изменения, уже после удаления фрагмента.
+    """
+    fragments = {
+        keys[key]: html
+        for key, (stamp, html) in found.items()
+        if stamps[keys[key]] == stamp
+    }
+    registry.count_fragments(
+        name, hits=len(fragments), misses=len(stamps) - len(fragments)
+    )
+    return fragments
+
+
+def get_fragments(name, stamps):
+    """Готовые HTML-фрагменты строк ``{pk: html}`` одним ``get_many``."""
+    keys = {fragment_key(name, pk): pk for pk in stamps}
+    found = _cache().get_many(keys, version=FRAGMENT_VERSION)
+    return _current(name, stamps, keys, found)
+
+
+async def aget_fragments(name, stamps):
+    """Асинхронная версия ``get_fragments()``."""
+    keys = {fragment_key(name, pk): pk for pk in stamps}
+    found = await _cache().aget_many(keys, version=FRAGMENT_VERSION)
+    return _current(name, stamps, keys, found)
+
+
+def set_fragment(name, pk, stamp, html):
+    timeout = getattr(
+        settings, "INVENTORY_FRAGMENT_CACHE_TIMEOUT", DEFAULT_FRAGMENT_TIMEOUT
+    )
+    _cache().set(
+        fragment_key(name, pk), (stamp, html), timeout, version=FRAGMENT_VERSION
+    )
+
+
+def evict_fragments(name, pks):
+    """Удаляет фрагменты строк ``pks``.
+
+    Устаревший фрагмент и так не отдаётся — отметка версии строки уже
+    другая; удаление освобождает кеш. Оно же нужно для данных, которые
+    в отметку не входят (например, название продукта в строке заказа),
+    поэтому повторяется после фиксации транзакции.
+    """
+    keys = [fragment_key(name, pk) for pk in set(pks) if pk is not None]
+    if not keys:
+        return
+    cache = _cache()
+    cache.delete_many(keys, version=FRAGMENT_VERSION)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: cache.delete_many(keys, version=FRAGMENT_VERSION))
+
+
+def evict_stock_fragments(pairs):
+    """Удаляет строки продуктов и складов для пар ``(warehouse_id, product_id)``."""
+    pairs = list(pairs)
+    evict_fragments("warehouse", [warehouse_id for warehouse_id, _ in pairs])
+    evict_fragments("product", [product_id for _, product_id in pairs])
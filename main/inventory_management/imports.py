@@ -0,0 +1,366 @@
+import csv
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+
+from .analytics import record_price_changes
+from .fragments import evict_fragments, evict_stock_fragments
+from .models import (
+    DashboardStats,
+    Order,
+    OrderItem,
+    Product,
+    StockMovement,
+    Warehouse,
+    WarehouseProduct,
+)
+from .sales import rebuild_sales
+from .stock import record_movements
+
+# Сколько строк проверяется и записывается в одной транзакции
+IMPORT_BATCH_SIZE = 2000
+
+
+class RowError(Exception):
+    """Строка файла не прошла проверку и пропускается."""
+
+
+class ImportReport:
+    """Итог импорта: сколько строк создано, изменено и не изменилось,
+    и ошибки в виде пар ``(номер строки файла, сообщение)``.
+    """
+
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.errors = []
+
+    def add(self, other):
+        self.created += other.created
+        self.updated += other.updated
+        self.unchanged += other.unchanged
+        self.errors.extend(other.errors)
+
+    @property
+    def processed(self):
+        return self.created + self.updated + self.unchanged
+
+
+def _clean(model, name, value):
+    """Значение столбца, приведённое и проверенное полем модели (без запросов)."""
+    field = model._meta.get_field(name)
+    value = (value or "").strip()
+    if not value:
+        if not field.blank:
+            raise RowError(f"{name}: обязательное поле")
+        return None if field.null else value
+    try:
+        return field.clean(value, None)
+    except ValidationError as error:
+        raise RowError(f"{name}: {' '.join(error.messages)}")
+
+
+def _parse_id(value, name):
+    # Существование объектов проверяется одним запросом на пачку
+    try:
+        return int((value or "").strip())
+    except ValueError:
+        raise RowError(f"{name}: нужен целочисленный id")
+
+
+def _last_per_key(batch, key, report):
+    """Оставляет для каждого ключа последнюю строку пачки, остальные — ошибки."""
+    rows = {}
+    for line, row in batch:
+        if key(row) in rows:
+            previous = rows[key(row)][0]
+            report.errors.append(
+                (previous, f"Строка повторяется в строке {line} и пропущена")
+            )
+        rows[key(row)] = (line, row)
+    return list(rows.values())
+
+
+def _run(file, required, parse_row, write_batch, batch_size):
+    report = ImportReport()
+    reader = csv.DictReader(file)
+    try:
+        columns = set(reader.fieldnames or ())
+        missing = [name for name in required if name not in columns]
+        if missing:
+            report.errors.append(
+                (1, f"Нет обязательных столбцов: {', '.join(missing)}")
+            )
+            return report
+
+        batch = []
+        for record in reader:
+            try:
+                batch.append((reader.line_num, parse_row(record, columns)))
+            except RowError as error:
+                report.errors.append((reader.line_num, str(error)))
+            if len(batch) >= batch_size:
+                report.add(_write(write_batch, batch, columns))
+                batch = []
+    except UnicodeDecodeError:
+        report.errors.append(
+            (reader.line_num + 1, "Файл должен быть в кодировке UTF-8")
+        )
+        return report
+    except csv.Error as error:
+        report.errors.append((reader.line_num, f"Некорректный CSV: {error}"))
+        return report
+    if batch:
+        report.add(_write(write_batch, batch, columns))
+    return report
+
+
+def _write(write_batch, batch, columns):
+    """Записывает пачку в отдельной транзакции.
+
+    Если БД отклонила пачку (например, параллельное изменение нарушило
+    ограничение), строки записываются по одной, чтобы найти виновные.
+    """
+    try:
+        with transaction.atomic():
+            return write_batch(batch, columns)
+    except IntegrityError:
+        report = ImportReport()
+        for line, row in batch:
+            try:
+                with transaction.atomic():
+                    report.add(write_batch([(line, row)], columns))
+            except IntegrityError as error:
+                report.errors.append((line, f"Ошибка БД: {error}"))
+        return report
+
+
+PRODUCT_COLUMNS = ("sku", "name", "price")
+
+
+def _parse_product(record, columns):
+    row = {
+        "sku": _clean(Product, "sku", record.get("sku")),
+        "name": _clean(Product, "name", record.get("name")),
+        "price": _clean(Product, "price", record.get("price")),
+    }
+    if not row["sku"]:
+        raise RowError("sku: обязательное поле")
+    if "description" in columns:
+        row["description"] = (record.get("description") or "").strip()
+    return row
+
+
+def _write_products(batch, columns):
+    report = ImportReport()
+    batch = _last_per_key(batch, lambda row: row["sku"], report)
+    fields = ["name", "price"] + (["description"] if "description" in columns else [])
+    existing = {
+        values["sku"]: values
+        for values in Product.objects.filter(
+            sku__in=[row["sku"] for _, row in batch]
+        ).values("pk", "sku", *fields)
+    }
+
+    products = []
+    changed_prices = {}
+    changed = []
+    for _, row in batch:
+        current = existing.get(row["sku"])
+        if current is None:
+            report.created += 1
+        elif all(current[name] == row[name] for name in fields):
+            report.unchanged += 1
+            continue
+        else:
+            report.updated += 1
+            changed.append(current["pk"])
+            if current["price"] != row["price"]:
+                changed_prices[current["pk"]] = row["price"] - current["price"]
+        products.append(Product(**row))
+
+    Product.objects.bulk_create(
+        products,
+        update_conflicts=True,
+        unique_fields=["sku"],
+        update_fields=fields + ["updated_at"],
+    )
+
+    # bulk_create не вызывает сигналы: повторяем то, что делает product_saved
+    if report.created:
+        DashboardStats.adjust(products_amount=report.created)
+    if changed_prices:
+        Order.objects.filter(items__product__in=list(changed_prices)).refresh_totals()
+        rebuild_sales(list(changed_prices))
+        record_price_changes(changed_prices)
+    if changed:
+        evict_fragments("product", changed)
+        evict_fragments(
+            "warehouse",
+            WarehouseProduct.objects.filter(product__in=changed).values_list(
+                "warehouse_id", flat=True
+            ),
+        )
+        evict_fragments(
+            "order",
+            OrderItem.objects.filter(product__in=changed).values_list(
+                "order_id", flat=True
+            ),
+        )
+    return report
+
+
+def import_products(file, batch_size=IMPORT_BATCH_SIZE):
+    """Создаёт и обновляет продукты из CSV со столбцами ``sku``, ``name``,
+    ``price`` и необязательным ``description``; продукты сопоставляются по sku.
+    """
+    report = _run(file, PRODUCT_COLUMNS, _parse_product, _write_products, batch_size)
+    if report.updated:
+        DashboardStats.recalculate_month_income()
+    return report
+
+
+STOCK_COLUMNS = ("warehouse_id", "quantity")
+
+
+def _parse_stock(record, columns):
+    row = {
+        "warehouse_id": _parse_id(record.get("warehouse_id"), "warehouse_id"),
+        "quantity": _clean(WarehouseProduct, "quantity", record.get("quantity")),
+    }
+    if (record.get("product_id") or "").strip():
+        row["product_id"] = _parse_id(record["product_id"], "product_id")
+    elif (record.get("sku") or "").strip():
+        row["sku"] = _clean(Product, "sku", record["sku"])
+    else:
+        raise RowError("Нужен product_id или sku продукта")
+    if "reorder_level" in columns:
+        row["reorder_level"] = _clean(
+            WarehouseProduct, "reorder_level", record.get("reorder_level")
+        )
+    return row
+
+
+def _write_stock(batch, columns):
+    report = ImportReport()
+    skus = {row["sku"] for _, row in batch if "sku" in row}
+    by_sku = dict(Product.objects.filter(sku__in=skus).values_list("sku", "pk"))
+    product_ids = set(
+        Product.objects.filter(
+            pk__in=[row["product_id"] for _, row in batch if "product_id" in row]
+        ).values_list("pk", flat=True)
+    )
+    product_ids.update(by_sku.values())
+    warehouse_ids = set(
+        Warehouse.objects.filter(
+            pk__in={row["warehouse_id"] for _, row in batch}
+        ).values_list("pk", flat=True)
+    )
+
+    resolved = []
+    for line, row in batch:
+        if "sku" in row:
+            if row["sku"] not in by_sku:
+                report.errors.append((line, f"Нет продукта с sku {row['sku']}"))
+                continue
+            row["product_id"] = by_sku[row.pop("sku")]
+        if row["product_id"] not in product_ids:
+            report.errors.append((line, f"Нет продукта с id {row['product_id']}"))
+        elif row["warehouse_id"] not in warehouse_ids:
+            report.errors.append((line, f"Нет склада с id {row['warehouse_id']}"))
+        else:
+            resolved.append((line, row))
+    resolved = _last_per_key(
+        resolved, lambda row: (row["warehouse_id"], row["product_id"]), report
+    )
+
+    # Блокировка строк: резерв не должен измениться между проверкой и записью
+    existing = {
+        (warehouse_id, product_id): (quantity, reserved, reorder_level, version)
+        for warehouse_id, product_id, quantity, reserved, reorder_level, version in (
+            WarehouseProduct.objects.select_for_update()
+            .filter(
+                warehouse_id__in={row["warehouse_id"] for _, row in resolved},
+                product_id__in={row["product_id"] for _, row in resolved},
+            )
+            .values_list(
+                "warehouse_id",
+                "product_id",
+                "quantity",
+                "reserved",
+                "reorder_level",
+                "version",
+            )
+        )
+    }
+
+    rows = []
+    movements = []
+    relabelled = []
+    for line, row in resolved:
+        pair = (row["warehouse_id"], row["product_id"])
+        quantity, reserved, reorder_level, version = existing.get(
+            pair, (0, 0, None, -1)
+        )
+        level = row.get("reorder_level", reorder_level)
+        if row["quantity"] < reserved:
+            report.errors.append(
+                (line, f"Количество {row['quantity']} меньше резерва {reserved}")
+            )
+            continue
+        if pair not in existing:
+            report.created += 1
+        elif row["quantity"] == quantity and level == reorder_level:
+            report.unchanged += 1
+            continue
+        else:
+            report.updated += 1
+        # Строки заблокированы, поэтому следующая версия известна заранее
+        rows.append(WarehouseProduct(**row, version=version + 1))
+        if row["quantity"] != quantity:
+            movements.append(
+                StockMovement(
+                    warehouse_id=pair[0],
+                    product_id=pair[1],
+                    kind=(
+                        StockMovement.RECEIPT
+                        if pair not in existing
+                        else StockMovement.ADJUSTMENT
+                    ),
+                    quantity=row["quantity"] - quantity,
+                )
+            )
+        else:
+            relabelled.append(pair)
+
+    WarehouseProduct.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=["warehouse", "product"],
+        update_fields=["quantity", "version"]
+        + (["reorder_level"] if "reorder_level" in columns else []),
+    )
+    # Журнал движения удаляет закешированные строки изменённых остатков
+    record_movements(movements)
+    evict_stock_fragments(relabelled)
+    return report
+
+
+def import_stock(file, batch_size=IMPORT_BATCH_SIZE):
+    """Задаёт остатки из CSV со столбцами ``warehouse_id``, ``quantity``,
+    ``product_id`` или ``sku`` и необязательным ``reorder_level``.
+
+    Количество задаётся абсолютным значением; разница с текущим остатком
+    записывается в журнал движения.
+    """
+    report = _run(file, STOCK_COLUMNS, _parse_stock, _write_stock, batch_size)
+    if report.processed:
+        DashboardStats.refresh_low_stock()
+    return report
+
+
+IMPORTERS = {
+    "products": import_products,
+    "stock": import_stock,
+}
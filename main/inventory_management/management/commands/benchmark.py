@@ -0,0 +1,132 @@
+import json
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from inventory_management.benchmark import (
+    NO_FRAGMENT_CACHE,
+    QUERY_BUDGETS,
+    benchmark_pages,
+    measure,
+)
+from inventory_management.models import Order, OrderItem, Product, WarehouseProduct
+
+
+class Rollback(Exception):
+    """Откатывает временного пользователя и сессию после замеров."""
+
+
+class Command(BaseCommand):
+    help = (
+        "Замеряет число SQL-запросов, время и пик памяти для каждой страницы "
+        "на текущей БД и сохраняет результат в JSON для сравнения между коммитами"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output", help="Файл, в который записываются результаты (JSON)"
+        )
+        parser.add_argument(
+            "--compare", help="Файл с прошлыми результатами для сравнения"
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=5,
+            help="Сколько раз открывать каждую страницу (время — медиана)",
+        )
+        parser.add_argument(
+            "--label", default="", help="Метка прогона, например коммит"
+        )
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options["compare"]:
+            try:
+                with open(options["compare"], encoding="utf-8") as file:
+                    baseline = json.load(file)["pages"]
+            except (OSError, ValueError, KeyError) as error:
+                raise CommandError(
+                    f"Не удалось прочитать {options['compare']}: {error}"
+                )
+
+        # Без кеша фрагментов: бюджеты описывают холодный путь, а не попадания
+        caches = {**settings.CACHES, "benchmark": NO_FRAGMENT_CACHE}
+        try:
+            with override_settings(CACHES=caches, INVENTORY_FRAGMENT_CACHE="benchmark"):
+                with transaction.atomic():
+                    pages = self.run_pages(options["repeat"])
+                    raise Rollback
+        except Rollback:
+            pass
+
+        result = {
+            "label": options["label"],
+            "created_at": timezone.now().isoformat(),
+            "dataset": {
+                "products": Product.objects.count(),
+                "stock_rows": WarehouseProduct.objects.count(),
+                "orders": Order.objects.count(),
+                "order_items": OrderItem.objects.count(),
+            },
+            "pages": pages,
+        }
+
+        self.print_report(pages, baseline)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as file:
+                json.dump(result, file, ensure_ascii=False, indent=2)
+            self.stdout.write(f"Результаты записаны в {options['output']}")
+
+        over_budget = [
+            name
+            for name, metrics in pages.items()
+            if metrics["queries"] > QUERY_BUDGETS[name]
+        ]
+        if over_budget:
+            raise CommandError(
+                "Превышен бюджет SQL-запросов: " + ", ".join(sorted(over_budget))
+            )
+
+    def run_pages(self, repeat):
+        # Случайное имя не совпадёт с существующим пользователем
+        user = get_user_model().objects.create_superuser(
+            f"benchmark-{uuid.uuid4().hex}", password=None
+        )
+        client = Client(SERVER_NAME="localhost")
+        client.force_login(user)
+
+        pages = {}
+        for name, url in benchmark_pages():
+            metrics = measure(client, url, repeat=repeat)
+            if metrics["status"] != 200:
+                raise CommandError(f"{url} вернул статус {metrics['status']}")
+            pages[name] = metrics
+        return pages
+
+    def print_report(self, pages, baseline):
+        for name, metrics in pages.items():
+            line = (
+                f"{name:<56} {metrics['queries']:>3} запр. "
+                f"{metrics['wall_time'] * 1000:>8.1f} мс "
+                f"{metrics['peak_memory'] / 1024:>8.0f} КиБ"
+            )
+            previous = (baseline or {}).get(name)
+            if previous:
+                line += (
+                    f"  ({metrics['queries'] - previous['queries']:+d} запр., "
+                    f"{(metrics['wall_time'] - previous['wall_time']) * 1000:+.1f} мс, "
+                    f"{(metrics['peak_memory'] - previous['peak_memory']) / 1024:+.0f} КиБ)"
+                )
+            style = (
+                self.style.ERROR
+                if metrics["queries"] > QUERY_BUDGETS[name]
+                else self.style.SUCCESS
+            )
+            self.stdout.write(style(line))
@@ -0,0 +1,67 @@
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client
+from django.test.utils import override_settings
+
+from inventory_management.benchmark import NO_FRAGMENT_CACHE, benchmark_pages
+from inventory_management.plans import check_queries, explain, page_queries
+
+
+class Rollback(Exception):
+    """Откатывает временного пользователя и сессию после проверки."""
+
+
+class Command(BaseCommand):
+    help = (
+        "Выполняет EXPLAIN для SQL-запросов каждой страницы на текущей БД "
+        "и сообщает о запросах, читающих таблицы целиком без индекса"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--min-rows",
+            type=int,
+            default=1000,
+            help="Не учитывать таблицы, в которых меньше строк",
+        )
+
+    def handle(self, *args, **options):
+        caches = {**settings.CACHES, "plan_check": NO_FRAGMENT_CACHE}
+        try:
+            with override_settings(
+                CACHES=caches, INVENTORY_FRAGMENT_CACHE="plan_check"
+            ):
+                with transaction.atomic():
+                    problems = self.check_pages(options["min_rows"])
+                    raise Rollback
+        except Rollback:
+            pass
+
+        for name, sql, tables, plan in problems:
+            self.stdout.write(
+                self.style.ERROR(f"{name}: полное чтение {', '.join(tables)}")
+            )
+            self.stdout.write(f"  {sql}")
+            for line in plan:
+                self.stdout.write(f"    {line}")
+        if problems:
+            raise CommandError(f"Запросов с полным чтением таблиц: {len(problems)}")
+        self.stdout.write(self.style.SUCCESS("Полных чтений таблиц не найдено"))
+
+    def check_pages(self, min_rows):
+        user = get_user_model().objects.create_superuser(
+            f"plan_check-{uuid.uuid4().hex}", password=None
+        )
+        client = Client(SERVER_NAME="localhost")
+        client.force_login(user)
+
+        problems = []
+        for name, url in benchmark_pages():
+            queries = page_queries(client, url)
+            for sql, tables in check_queries(queries, min_rows=min_rows):
+                problems.append((name, sql, tables, explain(sql)))
+        return problems
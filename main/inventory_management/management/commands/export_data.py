@@ -0,0 +1,64 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory_management.exports import (
+    EXPORT_CHUNK_SIZE,
+    EXPORTS,
+    FORMATS,
+    export_filename,
+    stream_export,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Выгружает заказы, позиции заказов или остатки в CSV/NDJSON; строки "
+        "читаются из БД пачками, поэтому размер выгрузки не ограничен памятью"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("export", choices=sorted(EXPORTS), help="Что выгружать")
+        parser.add_argument(
+            "--format", choices=sorted(FORMATS), default="csv", help="Формат файла"
+        )
+        parser.add_argument("--gzip", action="store_true", help="Сжать выгрузку в gzip")
+        parser.add_argument(
+            "--output",
+            help="Файл для выгрузки; '-' — стандартный вывод. "
+            "По умолчанию имя выгрузки с расширением формата",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=EXPORT_CHUNK_SIZE,
+            help="Сколько строк читать из БД за раз",
+        )
+
+    def handle(self, *args, **options):
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size должен быть положительным")
+        output = options["output"] or export_filename(
+            options["export"], options["format"], options["gzip"]
+        )
+        chunks = stream_export(
+            options["export"],
+            options["format"],
+            compress=options["gzip"],
+            chunk_size=options["chunk_size"],
+        )
+
+        if output == "-":
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
+            return
+
+        try:
+            with open(output, "wb") as file:
+                size = sum(file.write(chunk) for chunk in chunks)
+        except OSError as error:
+            raise CommandError(f"Не удалось записать {output}: {error}")
+        self.stdout.write(
+            self.style.SUCCESS(f"Выгрузка записана в {output} ({size} байт)")
+        )
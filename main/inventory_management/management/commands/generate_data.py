@@ -0,0 +1,298 @@
+import random
+from array import array
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F, Max, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from inventory_management.models import (
+    DashboardStats,
+    Order,
+    OrderItem,
+    Product,
+    StockMovement,
+    Warehouse,
+    WarehouseProduct,
+)
+
+PRODUCT_KINDS = [
+    "Кирпич",
+    "Балка",
+    "Пружина",
+    "Болт",
+    "Гайка",
+    "Доска",
+    "Труба",
+    "Профиль",
+    "Лист",
+    "Уголок",
+    "Саморез",
+    "Швеллер",
+]
+PRODUCT_MATERIALS = [
+    "стальной",
+    "алюминиевый",
+    "керамический",
+    "деревянный",
+    "медный",
+    "оцинкованный",
+    "пластиковый",
+]
+CITIES = ["Москва", "Санкт-Петербург", "Казань", "Екатеринбург", "Новосибирск"]
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """Позволяет задать ``created_at``/``updated_at`` вручную при bulk_create."""
+    fields = [
+        field
+        for model in models
+        for field in model._meta.concrete_fields
+        if getattr(field, "auto_now", False) or getattr(field, "auto_now_add", False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = (
+        "Генерирует детерминированный набор тестовых данных заданного размера "
+        "(продукты, склады, остатки, заказы и позиции)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=10_000)
+        parser.add_argument("--warehouses", type=int, default=20)
+        parser.add_argument("--orders", type=int, default=10_000)
+        parser.add_argument(
+            "--items-per-order",
+            type=int,
+            default=5,
+            help="Максимальное число позиций в заказе",
+        )
+        parser.add_argument(
+            "--stock-per-product",
+            type=int,
+            default=3,
+            help="Максимальное число складов, на которых лежит продукт",
+        )
+        parser.add_argument(
+            "--completed-ratio",
+            type=float,
+            default=0.7,
+            help="Доля завершённых заказов",
+        )
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=365,
+            help="За сколько последних дней распределяются даты заказов",
+        )
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if options["products"] < 1 or options["warehouses"] < 1:
+            raise CommandError("Нужен хотя бы один продукт и один склад")
+
+        self.rng = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        self.now = timezone.now()
+
+        with explicit_timestamps(Product, Order):
+            product_ids, prices = self.create_products(options["products"])
+            warehouse_ids = self.create_warehouses(options["warehouses"])
+            self.create_orders(options, product_ids, prices, warehouse_ids)
+            self.create_stock(options, product_ids, warehouse_ids)
+
+        self.write_progress("Пересчёт статистики дашборда")
+        DashboardStats.recalculate()
+        self.stdout.write(self.style.SUCCESS("Тестовые данные созданы"))
+
+    def write_progress(self, label, done=None, total=None):
+        if total is None:
+            self.stdout.write(label)
+        else:
+            self.stdout.write(f"{label}: {done}/{total}")
+
+    def batches(self, total):
+        for start in range(0, total, self.batch_size):
+            yield start, min(start + self.batch_size, total)
+
+    def random_moment(self, days):
+        return self.now - timedelta(seconds=self.rng.randrange(days * 86400 or 1))
+
+    def product_warehouses(self, index, warehouse_ids, stock_per_product):
+        """Склады продукта вычисляются из его номера, без хранения в памяти."""
+        count = min(1 + index % stock_per_product, len(warehouse_ids))
+        first = index * 7919 % len(warehouse_ids)
+        return [
+            warehouse_ids[(first + offset) % len(warehouse_ids)]
+            for offset in range(count)
+        ]
+
+    def create_products(self, total):
+        product_ids = array("q")
+        prices = array("q")  # в копейках
+        for start, end in self.batches(total):
+            products = []
+            for index in range(start, end):
+                cents = self.rng.randrange(1_000, 5_000_000)
+                kind = self.rng.choice(PRODUCT_KINDS)
+                material = self.rng.choice(PRODUCT_MATERIALS)
+                created_at = self.random_moment(730)
+                products.append(
+                    Product(
+                        name=f"{kind} {material} №{index + 1}",
+                        description=f"{kind} {material}, артикул {index + 1:08d}",
+                        price=Decimal(cents) / 100,
+                        created_at=created_at,
+                        updated_at=created_at,
+                    )
+                )
+                prices.append(cents)
+            with transaction.atomic():
+                created = Product.objects.bulk_create(products)
+            product_ids.extend(product.pk for product in created)
+            self.write_progress("Продукты", end, total)
+        return product_ids, prices
+
+    def create_warehouses(self, total):
+        warehouses = [
+            Warehouse(
+                name=f"Склад №{index + 1}",
+                location=f"{self.rng.choice(CITIES)}, промзона {index + 1}",
+            )
+            for index in range(total)
+        ]
+        with transaction.atomic():
+            created = Warehouse.objects.bulk_create(warehouses)
+        self.write_progress("Склады", total, total)
+        return [warehouse.pk for warehouse in created]
+
+    def create_orders(self, options, product_ids, prices, warehouse_ids):
+        total = options["orders"]
+        for start, end in self.batches(total):
+            orders = []
+            lines = []
+            for _ in range(start, end):
+                status = (
+                    "Completed"
+                    if self.rng.random() < options["completed_ratio"]
+                    else "Pending"
+                )
+                created_at = self.random_moment(options["days"])
+                indexes = {
+                    self.rng.randrange(len(product_ids))
+                    for _ in range(self.rng.randint(1, options["items_per_order"]))
+                }
+                order_lines = [
+                    (index, self.rng.randint(1, 10)) for index in sorted(indexes)
+                ]
+                total_cents = sum(prices[i] * quantity for i, quantity in order_lines)
+                orders.append(
+                    Order(
+                        status=status,
+                        total=Decimal(total_cents) / 100,
+                        created_at=created_at,
+                        updated_at=created_at,
+                        completed_at=created_at if status == "Completed" else None,
+                    )
+                )
+                lines.append(order_lines)
+
+            with transaction.atomic():
+                created = Order.objects.bulk_create(orders)
+                OrderItem.objects.bulk_create(
+                    OrderItem(
+                        order_id=order.pk,
+                        product_id=product_ids[index],
+                        warehouse_id=self.product_warehouses(
+                            index, warehouse_ids, options["stock_per_product"]
+                        )[0],
+                        quantity=quantity,
+                    )
+                    for order, order_lines in zip(created, lines)
+                    for index, quantity in order_lines
+                )
+            self.write_progress("Заказы", end, total)
+
+    def create_stock(self, options, product_ids, warehouse_ids):
+        # Дальнейшие массовые UPDATE затрагивают только созданные сейчас строки
+        last_existing = WarehouseProduct.objects.aggregate(last=Max("pk"))["last"]
+        new_rows = WarehouseProduct.objects.filter(pk__gt=last_existing or 0)
+
+        total = len(product_ids)
+        for start, end in self.batches(total):
+            rows = [
+                WarehouseProduct(
+                    warehouse_id=warehouse_id,
+                    product_id=product_ids[index],
+                    quantity=self.rng.randint(0, 500),
+                )
+                for index in range(start, end)
+                for warehouse_id in self.product_warehouses(
+                    index, warehouse_ids, options["stock_per_product"]
+                )
+            ]
+            with transaction.atomic():
+                WarehouseProduct.objects.bulk_create(rows)
+            self.write_progress("Остатки", end, total)
+
+        # Резерв под незавершённые заказы — одним UPDATE по агрегату позиций;
+        # остаток увеличивается на ту же величину, чтобы свободный не ушёл в минус
+        self.write_progress("Резервирование товара под незавершённые заказы")
+        reserved = (
+            OrderItem.objects.filter(
+                order__status="Pending",
+                warehouse_id=OuterRef("warehouse_id"),
+                product_id=OuterRef("product_id"),
+            )
+            .order_by()
+            .values("warehouse_id", "product_id")
+            .annotate(total=Sum("quantity"))
+            .values("total")
+        )
+        reserved = Coalesce(Subquery(reserved), 0)
+        with transaction.atomic():
+            new_rows.update(reserved=reserved, quantity=F("quantity") + reserved)
+
+        # Начальные остатки попадают в журнал движения
+        movements = (
+            new_rows.filter(quantity__gt=0)
+            .values_list("warehouse_id", "product_id", "quantity")
+            .iterator(chunk_size=self.batch_size)
+        )
+        batch = []
+        written = 0
+        for warehouse_id, product_id, quantity in movements:
+            batch.append(
+                StockMovement(
+                    warehouse_id=warehouse_id,
+                    product_id=product_id,
+                    kind=StockMovement.ADJUSTMENT,
+                    quantity=quantity,
+                )
+            )
+            if len(batch) >= self.batch_size:
+                written += self.flush_movements(batch)
+        written += self.flush_movements(batch)
+        self.write_progress(f"Журнал движения: {written} записей")
+
+    def flush_movements(self, batch):
+        with transaction.atomic():
+            StockMovement.objects.bulk_create(batch)
+        written = len(batch)
+        batch.clear()
+        return written
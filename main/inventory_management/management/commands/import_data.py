@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory_management.imports import IMPORT_BATCH_SIZE, IMPORTERS
+
+
+class Command(BaseCommand):
+    help = (
+        "Загружает продукты или остатки из CSV пачками; строки с ошибками "
+        "пропускаются и выводятся в отчёте, остальные записываются"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=sorted(IMPORTERS), help="Что загружать")
+        parser.add_argument("path", help="CSV-файл в кодировке UTF-8")
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=IMPORT_BATCH_SIZE,
+            help="Сколько строк записывать в одной транзакции",
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size должен быть положительным")
+        try:
+            with open(options["path"], encoding="utf-8-sig", newline="") as file:
+                report = IMPORTERS[options["kind"]](
+                    file, batch_size=options["batch_size"]
+                )
+        except OSError as error:
+            raise CommandError(f"Не удалось прочитать {options['path']}: {error}")
+
+        for line, message in report.errors:
+            self.stderr.write(f"Строка {line}: {message}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Создано: {report.created}, обновлено: {report.updated}, "
+                f"без изменений: {report.unchanged}, ошибок: {len(report.errors)}"
+            )
+        )
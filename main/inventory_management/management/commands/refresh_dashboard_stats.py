@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from inventory_management.models import DashboardStats
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает статистику дашборда по исходным таблицам"
+
+    def handle(self, *args, **options):
+        stats = DashboardStats.recalculate()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Статистика пересчитана: {stats.products_amount} товаров, "
+                f"{stats.active_orders_amount + stats.completed_orders_amount} заказов"
+            )
+        )
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from inventory_management.stock import take_snapshot
+
+
+class Command(BaseCommand):
+    help = "Сохраняет снимок остатков по журналу движения товаров"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Размер пачки при записи снимка",
+        )
+
+    def handle(self, *args, **options):
+        rows = take_snapshot(batch_size=options["batch_size"])
+        if rows:
+            self.stdout.write(self.style.SUCCESS(f"Снимок сохранён: {rows} строк"))
+        else:
+            self.stdout.write("Новых движений нет, снимок не нужен")
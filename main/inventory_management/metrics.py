@@ -0,0 +1,231 @@
+import bisect
+import logging
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм (верхние, включительно)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 200, 500)
+SQL_TIME_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+RESPONSE_SIZE_BUCKETS = (1_000, 5_000, 10_000, 50_000, 100_000, 500_000, 1_000_000)
+
+# Запросы к БД дольше порога считаются медленными (секунды)
+DEFAULT_SLOW_QUERY_THRESHOLD = 0.1
+# Каждый какой медленный запрос попадает в лог вместе с текстом SQL
+DEFAULT_SLOW_QUERY_SAMPLE_EVERY = 10
+
+
+class Histogram:
+    """Гистограмма в формате Prometheus с произвольными метками."""
+
+    def __init__(self, name, documentation, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self._series = {}
+
+    def observe(self, labels, value):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * len(self.buckets), 0, 0.0]
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            series[0][index] += 1
+        series[1] += 1
+        series[2] += value
+
+    def render(self, label_names):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        for labels, (counts, count, total) in sorted(self._series.items()):
+            pairs = [
+                f'{name}="{_escape(value)}"' for name, value in zip(label_names, labels)
+            ]
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                bucket_labels = ",".join([*pairs, f'le="{bound}"'])
+                lines.append(f"{self.name}_bucket{{{bucket_labels}}} {cumulative}")
+            bucket_labels = ",".join([*pairs, 'le="+Inf"'])
+            lines.append(f"{self.name}_bucket{{{bucket_labels}}} {count}")
+            lines.append(f"{self.name}_sum{{{','.join(pairs)}}} {total}")
+            lines.append(f"{self.name}_count{{{','.join(pairs)}}} {count}")
+        return lines
+
+
+class Counter:
+    """Счётчик в формате Prometheus с произвольными метками."""
+
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self._series = {}
+
+    def inc(self, labels, value=1):
+        self._series[labels] = self._series.get(labels, 0) + value
+
+    def render(self, label_names):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} counter",
+        ]
+        for labels, value in sorted(self._series.items()):
+            pairs = ",".join(
+                f'{name}="{_escape(value)}"' for name, value in zip(label_names, labels)
+            )
+            lines.append(f"{self.name}{{{pairs}}} {value}")
+        return lines
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class MetricsRegistry:
+    """Метрики страниц в памяти процесса.
+
+    Каждый процесс (воркер gunicorn) считает свои метрики; Prometheus
+    различает их по адресу цели при сборе.
+    """
+
+    LABELS = ("view", "method")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.latency = Histogram(
+                "inventory_request_duration_seconds",
+                "Время обработки запроса",
+                LATENCY_BUCKETS,
+            )
+            self.query_count = Histogram(
+                "inventory_request_sql_queries",
+                "Число SQL-запросов на HTTP-запрос",
+                QUERY_COUNT_BUCKETS,
+            )
+            self.sql_time = Histogram(
+                "inventory_request_sql_duration_seconds",
+                "Суммарное время SQL-запросов на HTTP-запрос",
+                SQL_TIME_BUCKETS,
+            )
+            self.response_size = Histogram(
+                "inventory_response_size_bytes",
+                "Размер тела ответа",
+                RESPONSE_SIZE_BUCKETS,
+            )
+            self.slow_queries = Counter(
+                "inventory_slow_sql_queries_total",
+                "Число SQL-запросов дольше порога",
+            )
+            self.fragment_cache = Counter(
+                "inventory_fragment_cache_requests_total",
+                "Обращения к кешу фрагментов строк списков",
+            )
+
+    def observe(self, labels, latency, query_count, sql_time, response_size, slow):
+        with self._lock:
+            self.latency.observe(labels, latency)
+            self.query_count.observe(labels, query_count)
+            self.sql_time.observe(labels, sql_time)
+            if response_size is not None:
+                self.response_size.observe(labels, response_size)
+            if slow:
+                self.slow_queries.inc(labels, slow)
+
+    def count_fragments(self, name, hits, misses):
+        with self._lock:
+            if hits:
+                self.fragment_cache.inc((name, "hit"), hits)
+            if misses:
+                self.fragment_cache.inc((name, "miss"), misses)
+
+    def render(self):
+        """Все метрики в текстовом формате Prometheus."""
+        with self._lock:
+            lines = []
+            for metric in (
+                self.latency,
+                self.query_count,
+                self.sql_time,
+                self.response_size,
+                self.slow_queries,
+            ):
+                lines.extend(metric.render(self.LABELS))
+            lines.extend(self.fragment_cache.render(("fragment", "result")))
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+def view_name(request):
+    """Имя маршрута запроса, например ``inventory_management:orders``."""
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unresolved"
+    return match.view_name
+
+
+class QueryCollector:
+    """Обёртка выполнения SQL, считающая запросы и их время за один HTTP-запрос."""
+
+    _slow_total = 0
+    _slow_lock = threading.Lock()
+
+    def __init__(self, request):
+        self.request = request
+        self.count = 0
+        self.duration = 0.0
+        self.slow = 0
+        self.threshold = getattr(
+            settings, "INVENTORY_SLOW_QUERY_THRESHOLD", DEFAULT_SLOW_QUERY_THRESHOLD
+        )
+        self.sample_every = getattr(
+            settings,
+            "INVENTORY_SLOW_QUERY_SAMPLE_EVERY",
+            DEFAULT_SLOW_QUERY_SAMPLE_EVERY,
+        )
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.count += 1
+            self.duration += duration
+            if duration >= self.threshold:
+                self.slow += 1
+                self._sample(sql, duration)
+
+    def _sample(self, sql, duration):
+        # В лог попадает только каждый N-й медленный запрос, чтобы под
+        # нагрузкой лог не разрастался
+        with self._slow_lock:
+            sampled = QueryCollector._slow_total % max(self.sample_every, 1) == 0
+            QueryCollector._slow_total += 1
+        if sampled:
+            logger.warning(
+                "Медленный SQL-запрос в %s (%.1f мс): %s",
+                view_name(self.request),
+                duration * 1000,
+                sql,
+            )
+
+    def wrap(self):
+        """Подключает обёртку ко всем соединениям с БД."""
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(self))
+        return stack
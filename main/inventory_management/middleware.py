@@ -0,0 +1,62 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+
+from .metrics import QueryCollector, registry, view_name
+
+# Прочие методы объединяются в одну метку, чтобы число серий было ограничено
+KNOWN_METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+
+
+class MetricsMiddleware:
+    """Собирает время ответа, число и время SQL-запросов и размер ответа
+    для каждого маршрута; метрики отдаются представлением ``MetricsView``.
+
+    Работает и под WSGI, и под ASGI: во втором случае обёртка SQL
+    подключается в потоке запроса, где выполняются обращения к ORM.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+
+        collector = QueryCollector(request)
+        started = time.perf_counter()
+        with collector.wrap():
+            response = self.get_response(request)
+        self.record(request, response, collector, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        collector = QueryCollector(request)
+        started = time.perf_counter()
+        wrapper = await sync_to_async(collector.wrap)()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(wrapper.close)()
+        self.record(request, response, collector, time.perf_counter() - started)
+        return response
+
+    def record(self, request, response, collector, latency):
+        name = view_name(request)
+        if name == "inventory_management:metrics":
+            return
+        method = request.method if request.method in KNOWN_METHODS else "other"
+        registry.observe(
+            (name, method),
+            latency=latency,
+            query_count=collector.count,
+            sql_time=collector.duration,
+            response_size=None if response.streaming else len(response.content),
+            slow=collector.slow,
+        )
@@ -0,0 +1,56 @@
+# Generated by Django 5.1.15 on 2026-10-18 18:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory_management", "0003_remove_product_quantity"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DashboardStats",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("products_amount", models.IntegerField(default=0)),
+                ("warehouses_amount", models.IntegerField(default=0)),
+                ("active_orders_amount", models.IntegerField(default=0)),
+                ("completed_orders_amount", models.IntegerField(default=0)),
+                ("low_stock_products", models.IntegerField(default=0)),
+                ("total_users", models.IntegerField(default=0)),
+                ("most_popular_quantity", models.IntegerField(default=0)),
+                (
+                    "month_start",
+                    models.DateTimeField(
+                        help_text="Месяц, за который посчитан доход", null=True
+                    ),
+                ),
+                (
+                    "month_income",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "most_popular_product",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="inventory_management.product",
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.1.15 on 2026-10-18 18:12
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_order_totals(apps, schema_editor):
+    Order = apps.get_model("inventory_management", "Order")
+    OrderItem = apps.get_model("inventory_management", "OrderItem")
+    items_total = (
+        OrderItem.objects.filter(order=OuterRef("pk"))
+        .order_by()
+        .values("order")
+        .annotate(total=Sum(F("quantity") * F("product__price")))
+        .values("total")
+    )
+    Order.objects.update(
+        total=Coalesce(
+            Subquery(items_total), Value(Decimal("0")), output_field=DecimalField()
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory_management", "0004_dashboardstats"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="order",
+            name="total",
+            field=models.DecimalField(
+                decimal_places=2,
+                default=0,
+                help_text="Общая стоимость заказа (поддерживается сигналами)",
+                max_digits=12,
+            ),
+        ),
+        migrations.RunPython(fill_order_totals, migrations.RunPython.noop),
+    ]
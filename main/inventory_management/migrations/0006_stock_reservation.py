@@ -0,0 +1,33 @@
+# Generated by Django 5.1.15 on 2026-10-18 18:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory_management", "0005_order_total"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="orderitem",
+            name="warehouse",
+            field=models.ForeignKey(
+                blank=True,
+                help_text="Склад, на котором зарезервирована позиция",
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="order_items",
+                to="inventory_management.warehouse",
+            ),
+        ),
+        migrations.AddField(
+            model_name="warehouseproduct",
+            name="reserved",
+            field=models.PositiveIntegerField(
+                default=0, help_text="Зарезервировано под незавершённые заказы"
+            ),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.1.15 on 2026-10-18 18:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory_management", "0006_stock_reservation"),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name="warehouseproduct",
+            constraint=models.CheckConstraint(
+                condition=models.Q(("quantity__gte", models.F("reserved"))),
+                name="warehouseproduct_quantity_gte_reserved",
+            ),
+        ),
+    ]
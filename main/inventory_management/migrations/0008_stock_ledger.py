@@ -0,0 +1,142 @@
+# Generated by Django 5.1.15 on 2026-10-18 18:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def record_opening_balances(apps, schema_editor):
+    """Заносит существующие остатки в журнал как начальные корректировки."""
+    WarehouseProduct = apps.get_model("inventory_management", "WarehouseProduct")
+    StockMovement = apps.get_model("inventory_management", "StockMovement")
+    rows = WarehouseProduct.objects.filter(quantity__gt=0).values_list(
+        "warehouse_id", "product_id", "quantity"
+    )
+    StockMovement.objects.bulk_create(
+        (
+            StockMovement(
+                warehouse_id=warehouse_id,
+                product_id=product_id,
+                kind="adjustment",
+                quantity=quantity,
+            )
+            for warehouse_id, product_id, quantity in rows.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory_management", "0007_stock_quantity_constraint"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StockMovement",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("receipt", "Поступление"),
+                            ("shipment", "Отгрузка"),
+                            ("adjustment", "Корректировка"),
+                            ("transfer", "Перемещение"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "quantity",
+                    models.IntegerField(help_text="Изменение остатка (со знаком)"),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "order",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="stock_movements",
+                        to="inventory_management.order",
+                    ),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="stock_movements",
+                        to="inventory_management.product",
+                    ),
+                ),
+                (
+                    "warehouse",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="stock_movements",
+                        to="inventory_management.warehouse",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["warehouse", "product", "created_at"],
+                        name="stockmovement_pair_time_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="StockSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("quantity", models.IntegerField()),
+                ("last_movement_id", models.BigIntegerField()),
+                ("taken_at", models.DateTimeField()),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="stock_snapshots",
+                        to="inventory_management.product",
+                    ),
+                ),
+                (
+                    "warehouse",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="stock_snapshots",
+                        to="inventory_management.warehouse",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["warehouse", "product", "taken_at"],
+                        name="stocksnapshot_pair_time_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(record_opening_balances, migrations.RunPython.noop),
+    ]
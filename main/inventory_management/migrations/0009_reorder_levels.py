@@ -0,0 +1,38 @@
+# Generated by Django 5.1.15 on 2026-10-18 18:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory_management", "0008_stock_ledger"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="warehouseproduct",
+            name="reorder_level",
+            field=models.PositiveIntegerField(
+                default=10,
+                help_text="Порог низкого запаса: ниже него товар нужно дозаказать",
+            ),
+        ),
+        migrations.AddField(
+            model_name="warehouseproduct",
+            name="is_low_stock",
+            field=models.GeneratedField(
+                db_persist=True,
+                expression=models.Q(("quantity__lt", models.F("reorder_level"))),
+                output_field=models.BooleanField(),
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="warehouseproduct",
+            index=models.Index(
+                condition=models.Q(("is_low_stock", True)),
+                fields=["id"],
+                name="warehouseproduct_low_stock_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,97 @@
+from django.db import migrations
+
+SQLITE_FORWARD = [
+    # Внешний контент: FTS5 хранит только индекс, текст берётся из таблицы
+    # продуктов; префиксные индексы ускоряют поиск по началу слова
+    """
+    CREATE VIRTUAL TABLE inventory_management_product_fts USING fts5(
+        name,
+        description,
+        content='inventory_management_product',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    """,
+    # Триггеры поддерживают индекс при любых изменениях, включая bulk_create.
+    # Миграции, пересоздающие таблицу продуктов на SQLite (AlterField и т.п.),
+    # удаляют триггеры — их нужно создать заново и перестроить индекс
+    """
+    CREATE TRIGGER inventory_management_product_fts_insert
+    AFTER INSERT ON inventory_management_product BEGIN
+        INSERT INTO inventory_management_product_fts (rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER inventory_management_product_fts_delete
+    AFTER DELETE ON inventory_management_product BEGIN
+        INSERT INTO inventory_management_product_fts
+            (inventory_management_product_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER inventory_management_product_fts_update
+    AFTER UPDATE OF name, description ON inventory_management_product BEGIN
+        INSERT INTO inventory_management_product_fts
+            (inventory_management_product_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO inventory_management_product_fts (rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+    """
+    INSERT INTO inventory_management_product_fts (inventory_management_product_fts)
+    VALUES ('rebuild')
+    """,
+]
+
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS inventory_management_product_fts_update",
+    "DROP TRIGGER IF EXISTS inventory_management_product_fts_delete",
+    "DROP TRIGGER IF EXISTS inventory_management_product_fts_insert",
+    "DROP TABLE IF EXISTS inventory_management_product_fts",
+]
+
+POSTGRESQL_FORWARD = [
+    # Вычисляемая колонка пересчитывается самой БД при каждом изменении строки
+    """
+    ALTER TABLE inventory_management_product ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('russian', coalesce(name, '')), 'A')
+        || setweight(to_tsvector('russian', coalesce(description, '')), 'B')
+    ) STORED
+    """,
+    """
+    CREATE INDEX inventory_management_product_search_idx
+    ON inventory_management_product USING GIN (search_vector)
+    """,
+]
+
+POSTGRESQL_BACKWARD = [
+    "DROP INDEX IF EXISTS inventory_management_product_search_idx",
+    "ALTER TABLE inventory_management_product DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory_management", "0009_reorder_levels"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run({"sqlite": SQLITE_FORWARD, "postgresql": POSTGRESQL_FORWARD}),
+            _run({"sqlite": SQLITE_BACKWARD, "postgresql": POSTGRESQL_BACKWARD}),
+        ),
+    ]
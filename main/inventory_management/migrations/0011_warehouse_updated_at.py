@@ -0,0 +1,18 @@
+# Generated by Django 5.1.15 on 2026-10-18 18:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory_management", "0010_product_search"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="warehouse",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 5.1.15 on 2026-10-18 18:47
+
+from importlib import import_module
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+product_search = import_module("inventory_management.migrations.0010_product_search")
+
+
+def restore_search_triggers(apps, schema_editor):
+    """Создаёт заново триггеры полнотекстового индекса и перестраивает его.
+
+    Добавление уникального поля на SQLite пересоздаёт таблицу продуктов,
+    а вместе с ней удаляются и триггеры из 0010_product_search.
+    """
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for statement in (
+        product_search.SQLITE_BACKWARD[:3] + product_search.SQLITE_FORWARD[1:]
+    ):
+        schema_editor.execute(statement)
+
+
+def merge_duplicate_stock(apps, schema_editor):
+    """Объединяет повторяющиеся строки остатков одного продукта на складе.
+
+    Количество и резерв складываются в строку с наименьшим id, остальные
+    удаляются; журнал движения уже хранит все изменения по паре.
+    """
+    WarehouseProduct = apps.get_model("inventory_management", "WarehouseProduct")
+    duplicates = (
+        WarehouseProduct.objects.values("warehouse_id", "product_id")
+        .annotate(
+            rows=Count("pk"),
+            keep=Min("pk"),
+            quantity=Sum("quantity"),
+            reserved=Sum("reserved"),
+        )
+        .filter(rows__gt=1)
+    )
+    for group in duplicates:
+        WarehouseProduct.objects.filter(pk=group["keep"]).update(
+            quantity=group["quantity"], reserved=group["reserved"]
+        )
+        WarehouseProduct.objects.filter(
+            warehouse_id=group["warehouse_id"], product_id=group["product_id"]
+        ).exclude(pk=group["keep"]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory_management", "0011_warehouse_updated_at"),
+    ]
+
+    operations = [
+        # При откате поле удаляется с пересозданием таблицы, и триггеры
+        # восстанавливаются уже после этого
+        migrations.RunPython(migrations.RunPython.noop, restore_search_triggers),
+        migrations.AddField(
+            model_name="product",
+            name="sku",
+            field=models.CharField(
+                blank=True,
+                help_text="Артикул; по нему строки импорта сопоставляются с продуктами",
+                max_length=64,
+                null=True,
+                unique=True,
+            ),
+        ),
+        migrations.RunPython(restore_search_triggers, migrations.RunPython.noop),
+        migrations.RunPython(merge_duplicate_stock, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="warehouseproduct",
+            constraint=models.UniqueConstraint(
+                fields=("warehouse", "product"), name="warehouseproduct_unique_product"
+            ),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.1.15 on 2026-10-18 18:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory_management", "0012_product_sku_unique_stock"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="orderitem",
+            name="product",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="inventory_management.product",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="warehouseproduct",
+            name="warehouse",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="warehouse_products",
+                to="inventory_management.warehouse",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                fields=["status", "created_at"], name="order_status_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(fields=["created_at", "id"], name="order_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="orderitem",
+            index=models.Index(
+                fields=["product", "order"], name="orderitem_product_order_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(fields=["created_at", "id"], name="product_created_idx"),
+        ),
+    ]
@@ -0,0 +1,155 @@
+# Generated by Django 5.1.15 on 2026-10-18 19:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+
+
+def fill_sales(apps, schema_editor):
+    Order = apps.get_model("inventory_management", "Order")
+    OrderItem = apps.get_model("inventory_management", "OrderItem")
+    ProductSales = apps.get_model("inventory_management", "ProductSales")
+    ProductSalesTotal = apps.get_model("inventory_management", "ProductSalesTotal")
+    # Момент завершения раньше не хранился: ближайшая оценка — последнее
+    # изменение заказа
+    Order.objects.filter(status="Completed").update(completed_at=F("updated_at"))
+
+    rows = (
+        OrderItem.objects.filter(order__status="Completed")
+        .annotate(day=TruncDate("order__completed_at"))
+        .values_list("product", "day")
+        .annotate(
+            units=Sum("quantity"),
+            orders=Count("order", distinct=True),
+            revenue=Sum(F("quantity") * F("product__price")),
+        )
+        .order_by()
+    )
+    ProductSales.objects.bulk_create(
+        (
+            ProductSales(
+                product_id=product_id,
+                day=day,
+                units=units,
+                orders=orders,
+                revenue=revenue,
+            )
+            for product_id, day, units, orders, revenue in rows
+        ),
+        batch_size=2000,
+    )
+    ProductSalesTotal.objects.bulk_create(
+        (
+            ProductSalesTotal(
+                product_id=product_id, units=units, orders=orders, revenue=revenue
+            )
+            for product_id, units, orders, revenue in ProductSales.objects.values_list(
+                "product"
+            )
+            .annotate(Sum("units"), Sum("orders"), Sum("revenue"))
+            .order_by()
+        ),
+        batch_size=2000,
+    )
+
+    # Лидер дашборда теперь определяется по проданным единицам
+    leader = (
+        ProductSalesTotal.objects.order_by("-units", "-product")
+        .values_list("product", "units")
+        .first()
+    )
+    product_id, quantity = leader or (None, 0)
+    apps.get_model("inventory_management", "DashboardStats").objects.update(
+        most_popular_product_id=product_id, most_popular_quantity=quantity
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory_management", "0013_hot_path_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="order",
+            name="completed_at",
+            field=models.DateTimeField(
+                blank=True,
+                help_text="Когда заказ завершён; по этой дате он попадает в продажи",
+                null=True,
+            ),
+        ),
+        migrations.CreateModel(
+            name="ProductSalesTotal",
+            fields=[
+                (
+                    "product",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="sales",
+                        serialize=False,
+                        to="inventory_management.product",
+                    ),
+                ),
+                ("units", models.IntegerField(default=0)),
+                ("orders", models.IntegerField(default=0)),
+                (
+                    "revenue",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["units", "product"], name="productsalestotal_units_idx"
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="ProductSales",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                ("units", models.IntegerField(default=0, help_text="Продано единиц")),
+                (
+                    "orders",
+                    models.IntegerField(
+                        default=0, help_text="Число заказов с продуктом"
+                    ),
+                ),
+                (
+                    "revenue",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        db_index=False,
+                        related_name="daily_sales",
+                        to="inventory_management.product",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("day", "product"), name="productsales_unique_day"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(fill_sales, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,142 @@
+# Generated by Django 5.1.15 on 2026-10-18 19:07
+
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, F, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+
+
+def fill_daily_stats(apps, schema_editor):
+    Order = apps.get_model("inventory_management", "Order")
+    OrderItem = apps.get_model("inventory_management", "OrderItem")
+    DailyOrderStats = apps.get_model("inventory_management", "DailyOrderStats")
+    DailyWarehouseStats = apps.get_model("inventory_management", "DailyWarehouseStats")
+    orders = (
+        Order.objects.annotate(day=TruncDate("created_at"))
+        .values_list("day", "status")
+        .annotate(
+            orders=Count("pk", distinct=True),
+            units=Coalesce(Sum("items__quantity"), 0),
+            revenue=Coalesce(
+                Sum(F("items__quantity") * F("items__product__price")),
+                Value(Decimal("0")),
+                output_field=DecimalField(max_digits=14, decimal_places=2),
+            ),
+        )
+        .order_by()
+    )
+    DailyOrderStats.objects.bulk_create(
+        (
+            DailyOrderStats(
+                day=day, status=status, orders=count, units=units, revenue=revenue
+            )
+            for day, status, count, units, revenue in orders
+        ),
+        batch_size=2000,
+    )
+    warehouses = (
+        OrderItem.objects.filter(warehouse__isnull=False)
+        .annotate(day=TruncDate("order__created_at"))
+        .values_list("warehouse", "day", "order__status")
+        .annotate(
+            orders=Count("order", distinct=True),
+            units=Sum("quantity"),
+            revenue=Sum(F("quantity") * F("product__price")),
+        )
+        .order_by()
+    )
+    DailyWarehouseStats.objects.bulk_create(
+        (
+            DailyWarehouseStats(
+                warehouse_id=warehouse_id,
+                day=day,
+                status=status,
+                orders=count,
+                units=units,
+                revenue=revenue,
+            )
+            for warehouse_id, day, status, count, units, revenue in warehouses
+        ),
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory_management", "0014_product_sales"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailyOrderStats",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                ("status", models.CharField(max_length=50)),
+                ("orders", models.IntegerField(default=0)),
+                ("units", models.IntegerField(default=0)),
+                (
+                    "revenue",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("day", "status"), name="dailyorderstats_unique_day"
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="DailyWarehouseStats",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                ("status", models.CharField(max_length=50)),
+                ("orders", models.IntegerField(default=0)),
+                ("units", models.IntegerField(default=0)),
+                (
+                    "revenue",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "warehouse",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_stats",
+                        to="inventory_management.warehouse",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("warehouse", "day", "status"),
+                        name="dailywarehousestats_unique_day",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(fill_daily_stats, migrations.RunPython.noop),
+    ]
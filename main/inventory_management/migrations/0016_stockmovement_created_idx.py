@@ -0,0 +1,19 @@
+# Generated by Django 5.1.15 on 2026-10-18 19:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory_management", "0015_daily_order_stats"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="stockmovement",
+            index=models.Index(
+                fields=["created_at", "id"], name="stockmovement_created_idx"
+            ),
+        ),
+    ]
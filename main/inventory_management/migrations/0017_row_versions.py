@@ -0,0 +1,49 @@
+# Generated by Django 5.1.15 on 2026-10-18 19:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory_management", "0016_stockmovement_created_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="order",
+            name="version",
+            field=models.PositiveIntegerField(
+                default=0,
+                editable=False,
+                help_text="Версия строки: растёт при каждом изменении",
+            ),
+        ),
+        migrations.AddField(
+            model_name="orderitem",
+            name="version",
+            field=models.PositiveIntegerField(
+                default=0,
+                editable=False,
+                help_text="Версия строки: растёт при каждом изменении",
+            ),
+        ),
+        migrations.AddField(
+            model_name="warehouse",
+            name="version",
+            field=models.PositiveIntegerField(
+                default=0,
+                editable=False,
+                help_text="Версия строки: растёт при каждом изменении",
+            ),
+        ),
+        migrations.AddField(
+            model_name="warehouseproduct",
+            name="version",
+            field=models.PositiveIntegerField(
+                default=0,
+                editable=False,
+                help_text="Версия строки: растёт при каждом изменении",
+            ),
+        ),
+    ]
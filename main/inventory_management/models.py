@@ -1,18 +1,136 @@
-from django.db import models
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from asgiref.sync import sync_to_async
+from django.db import models, transaction
+from django.db.models import Count, DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+# Порог низкого запаса по умолчанию для новых строк остатков
+LOW_STOCK_THRESHOLD = 10
+
+# Денежные суммы, посчитанные выражениями, SQLite возвращает без
+# фиксированного числа знаков; в выгрузках и отчётах они приводятся к копейкам
+CENTS = Decimal("0.01")
+
+
+class VersionConflictError(Exception):
+    """Строку изменили после того, как её прочитали: версия не совпала."""
+
+    def __init__(self, model, pks):
+        self.model = model
+        self.pks = sorted(pks)
+        super().__init__(f"Строки {model.__name__} {self.pks} изменены после чтения")
+
+
+class VersionedModel(models.Model):
+    """Модель с номером версии строки для оптимистичной блокировки.
+
+    Любая запись строки увеличивает ``version``: ``save()`` — через
+    :meth:`claim_versions`, массовые ``UPDATE`` — выражением
+    ``version=F("version") + 1``. Поэтому правка, основанная на устаревшем
+    чтении, не перезаписывает чужое изменение молча, а получает
+    :class:`VersionConflictError`, и строки при этом не блокируются.
+    """
+
+    version = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Версия строки: растёт при каждом изменении",
+    )
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def claim_versions(cls, versions):
+        """Увеличивает версии строк ``{pk: version}``, если они не изменились.
+
+        Один условный ``UPDATE ... WHERE pk = ? AND version = ?``
+        (compare-and-swap). Если совпали не все строки, бросает
+        :class:`VersionConflictError`; вызывайте в транзакции, чтобы уже
+        увеличенные версии откатились.
+        """
+        if cls._bump_versions(versions) != len(versions):
+            raise VersionConflictError(cls, versions)
+
+    @classmethod
+    def _bump_versions(cls, versions):
+        if not versions:
+            return 0
+        condition = reduce(
+            or_,
+            (models.Q(pk=pk, version=version) for pk, version in versions.items()),
+        )
+        return cls._base_manager.filter(condition).update(version=F("version") + 1)
+
+    def save(self, *args, **kwargs):
+        """Сохраняет строку, только если её версия совпадает с прочитанной."""
+        if self._state.adding:
+            return super().save(*args, **kwargs)
+        if kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = {*kwargs["update_fields"], "version"}
+        # Версия проверяется до записи, поэтому сигналы pre_save читают из БД
+        # то состояние, которое перезаписывается. Несовпавшая версия ничего
+        # не меняет, так что ошибка бросается вне транзакции и не ломает
+        # внешнюю
+        with transaction.atomic(savepoint=False):
+            claimed = self._bump_versions({self.pk: self.version})
+            if claimed:
+                self.version += 1
+                super().save(*args, **kwargs)
+        if not claimed:
+            raise VersionConflictError(type(self), [self.pk])
 
 
 class Product(models.Model):
     name = models.CharField(max_length=200)
+    sku = models.CharField(
+        max_length=64,
+        unique=True,
+        null=True,
+        blank=True,
+        help_text="Артикул; по нему строки импорта сопоставляются с продуктами",
+    )
     description = models.TextField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Список продуктов в админке отсортирован по дате создания
+            models.Index(fields=["created_at", "id"], name="product_created_idx"),
+        ]
+
     def __str__(self):
         return self.name
 
 
-class Warehouse(models.Model):
+class WarehouseQuerySet(models.QuerySet):
+    def with_stock_totals(self):
+        """Аннотирует склады итогами по остаткам одним GROUP BY запросом.
+
+        ``total_quantity`` — общее количество единиц, ``sku_count`` — число
+        разных продуктов, ``stock_value`` — стоимость остатков по текущим ценам.
+        """
+        return self.annotate(
+            total_quantity=Coalesce(Sum("warehouse_products__quantity"), 0),
+            sku_count=Count("warehouse_products"),
+            stock_value=Coalesce(
+                Sum(
+                    F("warehouse_products__quantity")
+                    * F("warehouse_products__product__price")
+                ),
+                Value(Decimal("0")),
+                output_field=DecimalField(max_digits=14, decimal_places=2),
+            ),
+        )
+
+
+class Warehouse(VersionedModel):
     name = models.CharField(max_length=200, help_text="Название склада")
     location = models.CharField(
         max_length=300, help_text="Адрес или место расположения склада"
@@ -20,49 +138,523 @@ class Warehouse(models.Model):
     products = models.ManyToManyField(
         Product, through="WarehouseProduct", related_name="warehouses"
     )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = WarehouseQuerySet.as_manager()
 
     def __str__(self):
         return self.name
 
 
-class WarehouseProduct(models.Model):
+class WarehouseProduct(VersionedModel):
+    # Отдельный индекс по складу не нужен: его покрывает уникальный
+    # индекс (warehouse, product)
     warehouse = models.ForeignKey(
-        Warehouse, on_delete=models.CASCADE, related_name="warehouse_products"
+        Warehouse,
+        on_delete=models.CASCADE,
+        related_name="warehouse_products",
+        db_index=False,
     )
     product = models.ForeignKey(
         Product, on_delete=models.CASCADE, related_name="warehouse_products"
     )
     quantity = models.PositiveIntegerField(help_text="Количество продукта на складе")
+    reserved = models.PositiveIntegerField(
+        default=0, help_text="Зарезервировано под незавершённые заказы"
+    )
+    reorder_level = models.PositiveIntegerField(
+        default=LOW_STOCK_THRESHOLD,
+        help_text="Порог низкого запаса: ниже него товар нужно дозаказать",
+    )
+    # Флаг поддерживается самой БД при любом изменении остатка или порога,
+    # включая массовые UPDATE, и проиндексирован частичным индексом
+    is_low_stock = models.GeneratedField(
+        expression=models.Q(quantity__lt=F("reorder_level")),
+        output_field=models.BooleanField(),
+        db_persist=True,
+    )
 
     def __str__(self):
         return f"{self.product.name} ({self.quantity}) in {self.warehouse.name}"
 
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(quantity__gte=F("reserved")),
+                name="warehouseproduct_quantity_gte_reserved",
+            ),
+            # Ключ для upsert остатков при импорте
+            models.UniqueConstraint(
+                fields=["warehouse", "product"], name="warehouseproduct_unique_product"
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["id"],
+                condition=models.Q(is_low_stock=True),
+                name="warehouseproduct_low_stock_idx",
+            ),
+        ]
+
+    @property
+    def available(self):
+        """Свободный остаток, который можно зарезервировать под новый заказ."""
+        return self.quantity - self.reserved
+
+
+def _line_total():
+    return F("quantity") * F("product__price")
+
+
+class OrderQuerySet(models.QuerySet):
+    def with_totals(self):
+        """Аннотирует заказы стоимостью ``items_total``, посчитанной в БД."""
+        return self.annotate(
+            items_total=Coalesce(
+                Sum(F("items__quantity") * F("items__product__price")),
+                Value(Decimal("0")),
+                output_field=DecimalField(max_digits=12, decimal_places=2),
+            )
+        )
+
+    def refresh_totals(self):
+        """Пересчитывает денормализованное поле ``total`` одним UPDATE.
 
-class Order(models.Model):
+        Сумма — производное поле, поэтому её пересчёт версию заказа не меняет.
+        """
+        items_total = (
+            OrderItem.objects.filter(order=OuterRef("pk"))
+            .order_by()
+            .values("order")
+            .annotate(total=Sum(_line_total()))
+            .values("total")
+        )
+        return self.update(
+            total=Coalesce(
+                Subquery(items_total), Value(Decimal("0")), output_field=DecimalField()
+            )
+        )
+
+
+class Order(VersionedModel):
     status = models.CharField(
         max_length=50, choices=[("Pending", "Ожидание"), ("Completed", "Завершён")]
     )
+    total = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+        help_text="Общая стоимость заказа (поддерживается сигналами)",
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    completed_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Когда заказ завершён; по этой дате он попадает в продажи",
+    )
+
+    objects = OrderQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Доход за месяц и фильтры API: статус и дата создания
+            models.Index(
+                fields=["status", "created_at"], name="order_status_created_idx"
+            ),
+            # Список заказов: keyset-пагинация по (-created_at, -id)
+            models.Index(fields=["created_at", "id"], name="order_created_idx"),
+        ]
 
     def __str__(self):
         return f"Order №{self.pk}"
 
     def total_price(self):
-        """Вычисление общей стоимости заказа."""
-        return sum(item.total_price() for item in self.items.all())
+        """Общая стоимость заказа без обхода позиций в Python.
+
+        Берётся из аннотации ``with_totals``, если она есть, иначе из
+        денормализованного поля ``total``.
+        """
+        return getattr(self, "items_total", self.total)
+
 
+class OrderItemQuerySet(models.QuerySet):
+    def with_totals(self):
+        """Аннотирует позиции стоимостью ``line_total``, посчитанной в БД."""
+        return self.annotate(
+            line_total=models.ExpressionWrapper(
+                _line_total(),
+                output_field=DecimalField(max_digits=12, decimal_places=2),
+            )
+        )
 
-class OrderItem(models.Model):
+
+class OrderItem(VersionedModel):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="items")
-    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    # Индекс по продукту — составной (product, order) в Meta
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, db_index=False)
     quantity = models.PositiveIntegerField(
         help_text="Количество этого продукта в заказе"
     )
+    warehouse = models.ForeignKey(
+        Warehouse,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="order_items",
+        help_text="Склад, на котором зарезервирована позиция",
+    )
+
+    objects = OrderItemQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Заказы с продуктом (пересчёт сумм при смене цены, сброс кеша
+            # строк) и популярность продуктов читаются только из индекса
+            models.Index(
+                fields=["product", "order"], name="orderitem_product_order_idx"
+            ),
+        ]
 
     def __str__(self):
         return f"{self.product.name} (x{self.quantity}) in Order №{self.order.pk}"
 
     def total_price(self):
         """Общая стоимость этой позиции в заказе."""
+        if hasattr(self, "line_total"):
+            return self.line_total
         return self.product.price * self.quantity
+
+
+class StockMovement(models.Model):
+    """Запись журнала движения товара (только вставка, без изменений).
+
+    Положительное ``quantity`` — поступление на склад, отрицательное —
+    списание. Текущий остаток хранится материализованно в
+    ``WarehouseProduct.quantity`` и меняется в той же транзакции.
+    """
+
+    RECEIPT = "receipt"
+    SHIPMENT = "shipment"
+    ADJUSTMENT = "adjustment"
+    TRANSFER = "transfer"
+    KIND_CHOICES = [
+        (RECEIPT, "Поступление"),
+        (SHIPMENT, "Отгрузка"),
+        (ADJUSTMENT, "Корректировка"),
+        (TRANSFER, "Перемещение"),
+    ]
+
+    warehouse = models.ForeignKey(
+        Warehouse, on_delete=models.CASCADE, related_name="stock_movements"
+    )
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="stock_movements"
+    )
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    quantity = models.IntegerField(help_text="Изменение остатка (со знаком)")
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="stock_movements",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["warehouse", "product", "created_at"],
+                name="stockmovement_pair_time_idx",
+            ),
+            # Журнал в админке: новые записи сверху без сортировки всей таблицы
+            models.Index(fields=["created_at", "id"], name="stockmovement_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.quantity:+} {self.product_id}"
+
+
+class StockSnapshot(models.Model):
+    """Снимок остатка пары склад/продукт на момент ``taken_at``.
+
+    Учитывает все движения с ``id <= last_movement_id``, поэтому остаток
+    на произвольный момент считается от ближайшего снимка без обхода
+    всего журнала.
+    """
+
+    warehouse = models.ForeignKey(
+        Warehouse, on_delete=models.CASCADE, related_name="stock_snapshots"
+    )
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="stock_snapshots"
+    )
+    quantity = models.IntegerField()
+    last_movement_id = models.BigIntegerField()
+    taken_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["warehouse", "product", "taken_at"],
+                name="stocksnapshot_pair_time_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id}@{self.warehouse_id}: {self.quantity}"
+
+
+class ProductSales(models.Model):
+    """Продажи продукта за день по завершённым заказам.
+
+    Поддерживаются инкрементально при завершении заказа и изменении его
+    позиций, поэтому рейтинг за период читает только строки этого периода,
+    а не всю историю заказов.
+    """
+
+    # Индекс по продукту не нужен: иначе SQLite группирует рейтинг за период
+    # обходом всей таблицы по этому индексу вместо чтения диапазона дней
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="daily_sales", db_index=False
+    )
+    day = models.DateField()
+    units = models.IntegerField(default=0, help_text="Продано единиц")
+    orders = models.IntegerField(default=0, help_text="Число заказов с продуктом")
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            # День первым: рейтинг за период читает диапазон этого индекса
+            models.UniqueConstraint(
+                fields=["day", "product"], name="productsales_unique_day"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id}@{self.day}: {self.units}"
+
+
+class ProductSalesTotal(models.Model):
+    """Продажи продукта за всё время (сумма строк ``ProductSales``)."""
+
+    product = models.OneToOneField(
+        Product, on_delete=models.CASCADE, primary_key=True, related_name="sales"
+    )
+    units = models.IntegerField(default=0)
+    orders = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        indexes = [
+            # Рейтинг за всё время — чтение начала индекса
+            models.Index(
+                fields=["units", "product"], name="productsalestotal_units_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id}: {self.units}"
+
+
+class DailyOrderStats(models.Model):
+    """Заказы, проданные единицы и выручка по дню создания и статусу заказа.
+
+    Поддерживается инкрементально сигналами заказов и позиций; графики и
+    доход за месяц читают только строки нужного диапазона дней.
+    """
+
+    day = models.DateField()
+    status = models.CharField(max_length=50)
+    orders = models.IntegerField(default=0)
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["day", "status"], name="dailyorderstats_unique_day"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.status}: {self.orders}"
+
+
+class DailyWarehouseStats(models.Model):
+    """То же, что ``DailyOrderStats``, по складам позиций.
+
+    Заказ считается в ``orders`` каждого склада, с которого в нём есть
+    позиции; позиции без склада учитываются только в общих итогах.
+    """
+
+    # Индекс по складу — начало ограничения уникальности
+    warehouse = models.ForeignKey(
+        Warehouse, on_delete=models.CASCADE, related_name="daily_stats", db_index=False
+    )
+    day = models.DateField()
+    status = models.CharField(max_length=50)
+    orders = models.IntegerField(default=0)
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["warehouse", "day", "status"],
+                name="dailywarehousestats_unique_day",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.warehouse_id}@{self.day} {self.status}: {self.orders}"
+
+
+STATUS_COUNTERS = {
+    "Pending": "active_orders_amount",
+    "Completed": "completed_orders_amount",
+}
+
+
+def current_month_start():
+    """Начало текущего месяца (граница для дохода на дашборде)."""
+    now = timezone.now()
+    return now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+class DashboardStats(models.Model):
+    """Предрассчитанная статистика для главной страницы.
+
+    В таблице всегда одна строка (pk=1). Счётчики поддерживаются сигналами
+    инкрементально, поэтому дашборд читает одну строку вместо обхода
+    истории заказов. ``recalculate`` пересчитывает всё с нуля.
+    """
+
+    products_amount = models.IntegerField(default=0)
+    warehouses_amount = models.IntegerField(default=0)
+    active_orders_amount = models.IntegerField(default=0)
+    completed_orders_amount = models.IntegerField(default=0)
+    low_stock_products = models.IntegerField(default=0)
+    total_users = models.IntegerField(default=0)
+    most_popular_product = models.ForeignKey(
+        Product, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    most_popular_quantity = models.IntegerField(default=0)
+    month_start = models.DateTimeField(
+        null=True, help_text="Месяц, за который посчитан доход"
+    )
+    month_income = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    SINGLETON_PK = 1
+
+    @classmethod
+    def load(cls):
+        """Возвращает строку статистики, пересчитывая её при необходимости."""
+        stats = (
+            cls.objects.select_related("most_popular_product")
+            .filter(pk=cls.SINGLETON_PK)
+            .first()
+        )
+        if stats is None:
+            return cls.recalculate()
+        if stats.month_start != current_month_start():
+            # Наступил новый месяц — доход считается заново
+            cls.recalculate_month_income()
+            stats.refresh_from_db()
+        return stats
+
+    @classmethod
+    async def aload(cls):
+        """Асинхронная версия ``load()``: пересчёт уходит в поток."""
+        stats = (
+            await cls.objects.select_related("most_popular_product")
+            .filter(pk=cls.SINGLETON_PK)
+            .afirst()
+        )
+        if stats is None or stats.month_start != current_month_start():
+            return await sync_to_async(cls.load)()
+        return stats
+
+    @classmethod
+    def adjust(cls, **deltas):
+        """Атомарно прибавляет значения к счётчикам (``F() + delta``)."""
+        deltas = {field: delta for field, delta in deltas.items() if delta}
+        if deltas:
+            cls.objects.filter(pk=cls.SINGLETON_PK).update(
+                **{field: F(field) + delta for field, delta in deltas.items()}
+            )
+
+    @classmethod
+    def recalculate(cls):
+        """Полный пересчёт статистики и продаж по исходным таблицам."""
+        from django.contrib.auth import get_user_model
+
+        from .analytics import rebuild_order_stats
+        from .sales import rebuild_sales
+
+        order_counts = dict(
+            Order.objects.values_list("status").annotate(Count("pk")).order_by()
+        )
+        stats, _ = cls.objects.update_or_create(
+            pk=cls.SINGLETON_PK,
+            defaults={
+                "products_amount": Product.objects.count(),
+                "warehouses_amount": Warehouse.objects.count(),
+                "active_orders_amount": order_counts.get("Pending", 0),
+                "completed_orders_amount": order_counts.get("Completed", 0),
+                "low_stock_products": WarehouseProduct.objects.filter(
+                    is_low_stock=True
+                ).count(),
+                "total_users": get_user_model().objects.count(),
+            },
+        )
+        rebuild_sales()
+        rebuild_order_stats()
+        cls.recalculate_month_income()
+        stats.refresh_from_db()
+        return stats
+
+    @classmethod
+    def recalculate_popular_product(cls):
+        """Пересчитывает самый популярный продукт (по проданным единицам).
+
+        Читается первая строка индекса итоговых продаж, а не все заказы.
+        """
+        popular = (
+            ProductSalesTotal.objects.filter(units__gt=0)
+            .order_by("-units", "-product")
+            .values_list("product", "units")
+            .first()
+        )
+        product_id, quantity = popular or (None, 0)
+        cls.objects.filter(pk=cls.SINGLETON_PK).update(
+            most_popular_product_id=product_id, most_popular_quantity=quantity
+        )
+
+    @classmethod
+    def refresh_low_stock(cls):
+        """Пересчитывает число позиций с низким запасом.
+
+        Нужен после массовых ``UPDATE``, которые не вызывают сигналы.
+        """
+        cls.objects.filter(pk=cls.SINGLETON_PK).update(
+            low_stock_products=WarehouseProduct.objects.filter(
+                is_low_stock=True
+            ).count()
+        )
+
+    @classmethod
+    def recalculate_month_income(cls):
+        """Пересчитывает доход от завершённых заказов за текущий месяц.
+
+        Читаются дневные итоги месяца, а не заказы.
+        """
+        month_start = current_month_start()
+        income = DailyOrderStats.objects.filter(
+            status="Completed", day__gte=timezone.localdate(month_start)
+        ).aggregate(income=Sum("revenue", default=Decimal("0")))["income"]
+        cls.objects.filter(pk=cls.SINGLETON_PK).update(
+            month_start=month_start, month_income=income
+        )
@@ -0,0 +1,200 @@
+import base64
+import json
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.exceptions import BadRequest, ValidationError
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+DEFAULT_PAGE_SIZE = 25
+MAX_PAGE_SIZE = 200
+
+
+def get_page_size(request):
+    """Размер страницы из ``?page_size=`` с ограничением сверху."""
+    default = getattr(settings, "INVENTORY_PAGE_SIZE", DEFAULT_PAGE_SIZE)
+    try:
+        page_size = int(request.GET.get("page_size", default))
+    except ValueError:
+        page_size = default
+    return max(1, min(page_size, MAX_PAGE_SIZE))
+
+
+@dataclass
+class KeysetPage:
+    object_list: list
+    page_size: int
+    next_cursor: str | None = None
+    previous_cursor: str | None = None
+    base_query: str = ""
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    """Курсорная (keyset) пагинация по уникальному набору полей.
+
+    Вместо OFFSET страница выбирается условием ``WHERE (a, b) < (:a, :b)``,
+    поэтому глубокие страницы стоят столько же, сколько первая. Последним
+    полем в ``ordering`` должен быть уникальный ключ (обычно ``id``).
+    """
+
+    def __init__(self, queryset, ordering, page_size=DEFAULT_PAGE_SIZE):
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.page_size = page_size
+        self.fields = [
+            queryset.model._meta.get_field(name.lstrip("-")) for name in self.ordering
+        ]
+
+    def page(self, after=None, before=None):
+        """Страница после курсора ``after`` или перед курсором ``before``."""
+        queryset, backwards, cursor = self._query(after, before)
+        return self._build(list(queryset), backwards, cursor)
+
+    async def apage(self, after=None, before=None):
+        """Асинхронная версия ``page()``."""
+        queryset, backwards, cursor = self._query(after, before)
+        rows = [row async for row in queryset]
+        return self._build(rows, backwards, cursor)
+
+    def _query(self, after, before):
+        backwards = before is not None
+        cursor = before if backwards else after
+
+        ordering = self.ordering
+        if backwards:
+            ordering = tuple(self._reverse(name) for name in ordering)
+
+        queryset = self.queryset.order_by(*ordering)
+        if cursor is not None:
+            queryset = queryset.filter(self._after(ordering, self.decode(cursor)))
+        return queryset[: self.page_size + 1], backwards, cursor
+
+    def _build(self, rows, backwards, cursor):
+        has_more = len(rows) > self.page_size
+        rows = rows[: self.page_size]
+        if backwards:
+            rows.reverse()
+
+        page = KeysetPage(object_list=rows, page_size=self.page_size)
+        if rows:
+            # В направлении движения есть ещё строки, если выбралось page_size + 1;
+            # в обратном — если мы пришли сюда по курсору
+            has_after = has_more if not backwards else True
+            has_before = has_more if backwards else cursor is not None
+            if has_after:
+                page.next_cursor = self.encode(rows[-1])
+            if has_before:
+                page.previous_cursor = self.encode(rows[0])
+        return page
+
+    def encode(self, obj):
+        values = [field.value_to_string(obj) for field in self.fields]
+        payload = json.dumps(values, separators=(",", ":")).encode()
+        return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+    def decode(self, cursor):
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            if len(values) != len(self.fields):
+                raise ValueError
+            return [field.to_python(value) for field, value in zip(self.fields, values)]
+        except (ValueError, TypeError, ValidationError):
+            raise BadRequest("Некорректный курсор пагинации")
+
+    @staticmethod
+    def _reverse(name):
+        return name[1:] if name.startswith("-") else f"-{name}"
+
+    @staticmethod
+    def _after(ordering, values):
+        """Условие «строго после» для лексикографического порядка."""
+        condition = Q()
+        for index, name in enumerate(ordering):
+            lookup = "lt" if name.startswith("-") else "gt"
+            step = Q(**{f"{name.lstrip('-')}__{lookup}": values[index]})
+            for prev_name, prev_value in zip(ordering[:index], values[:index]):
+                step &= Q(**{prev_name.lstrip("-"): prev_value})
+            condition |= step
+        return condition
+
+
+def paginate(request, queryset, ordering):
+    """Страница ``queryset`` по параметрам ``after``/``before``/``page_size``."""
+    paginator = KeysetPaginator(queryset, ordering, get_page_size(request))
+    page = paginator.page(
+        after=request.GET.get("after"), before=request.GET.get("before")
+    )
+    page.base_query = _base_query(request, paginator.page_size)
+    return page
+
+
+async def apaginate(request, queryset, ordering):
+    """Асинхронная версия ``paginate()``."""
+    paginator = KeysetPaginator(queryset, ordering, get_page_size(request))
+    page = await paginator.apage(
+        after=request.GET.get("after"), before=request.GET.get("before")
+    )
+    page.base_query = _base_query(request, paginator.page_size)
+    return page
+
+
+def _base_query(request, page_size):
+    # Ссылки на соседние страницы сохраняют фильтры текущего запроса
+    params = request.GET.copy()
+    params.pop("after", None)
+    params.pop("before", None)
+    params["page_size"] = page_size
+    return params.urlencode()
+
+
+def estimated_rows(table):
+    """Число строк таблицы по статистике PostgreSQL, без чтения таблицы.
+
+    ``None`` на других БД и до первого ``ANALYZE``/autovacuum.
+    """
+    if connection.vendor != "postgresql":
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [table]
+        )
+        row = cursor.fetchone()
+    return row[0] if row and row[0] >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор админки для больших таблиц.
+
+    Без фильтров и поиска общее число строк на PostgreSQL берётся из
+    статистики планировщика: ``COUNT(*)`` по всей таблице читает её целиком.
+    Небольшие таблицы, отфильтрованные выборки и другие БД считаются точно.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_rows(queryset.model._meta.db_table)
+            if estimate is not None and estimate >= getattr(
+                settings, "INVENTORY_ADMIN_ESTIMATE_COUNT_ROWS", 100_000
+            ):
+                return estimate
+        return super().count
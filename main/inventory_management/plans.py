@@ -0,0 +1,170 @@
+import json
+import re
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from .pagination import estimated_rows
+
+# Таблица в FROM/JOIN с псевдонимом Django: "inventory_management_order" U0
+TABLE_ALIAS = re.compile(r'"(\w+)" (?:AS )?"?([A-Z]\d+)\b"?')
+SQLITE_SCAN = re.compile(r"^SCAN (\w+)(?: AS (\w+))?$")
+# Опкоды условных переходов: переход на ``Next`` цикла пропускает строку.
+# Поиск родительской строки по первичному ключу (SeekRowid, NotExists) в
+# JOIN по внешнему ключу строк не пропускает и сюда не входит
+SQLITE_JUMPS = {
+    "Eq",
+    "Ne",
+    "Lt",
+    "Le",
+    "Gt",
+    "Ge",
+    "If",
+    "IfNot",
+    "IsNull",
+    "NotNull",
+    "SeekGE",
+    "SeekGT",
+    "SeekLE",
+    "SeekLT",
+    "IdxGE",
+    "IdxGT",
+    "IdxLE",
+    "IdxLT",
+    "Found",
+    "NotFound",
+    "Goto",
+}
+
+
+def _postgresql_plan(sql):
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}")
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Plan"]
+
+
+def _walk(node, depth=0):
+    yield depth, node
+    for child in node.get("Plans", ()):
+        yield from _walk(child, depth + 1)
+
+
+def explain(sql):
+    """План запроса построчно: EXPLAIN QUERY PLAN на SQLite,
+    узлы EXPLAIN (FORMAT JSON) с отступом по вложенности на PostgreSQL."""
+    if connection.vendor == "sqlite":
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+            return [row[-1] for row in cursor.fetchall()]
+    if connection.vendor == "postgresql":
+        return [
+            f"{'  ' * depth}{node['Node Type']} {node.get('Relation Name', '')}".rstrip()
+            for depth, node in _walk(_postgresql_plan(sql))
+        ]
+    return []
+
+
+def _sqlite_limited_walks(sql):
+    """Таблицы, обход которых программа запроса останавливает по ``LIMIT``.
+
+    Решение принимается по байткоду (``EXPLAIN``), а не по тексту SQL: в теле
+    цикла по таблице стоит счётчик ``LIMIT`` (``DecrJumpZero``), который
+    выходит из цикла, и ни одно условие не переходит на его ``Next``, то есть
+    не пропускает строки. Если строки сначала сортируются во временном
+    B-дереве, счётчик стоит в другом цикле; если строки фильтруются, обход
+    может пройти всю таблицу, прежде чем наберётся ``LIMIT`` строк.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN {sql}")
+        program = cursor.fetchall()
+        cursor.execute("SELECT rootpage, tbl_name FROM sqlite_master")
+        tables = dict(cursor.fetchall())
+
+    cursors = {}
+    walks = set()
+    for address, opcode, p1, p2, *_ in program:
+        if opcode == "OpenRead":
+            cursors[p1] = tables.get(p2)
+        elif opcode in ("Next", "Prev"):
+            # p2 — начало тела цикла, адреса команд идут подряд с нуля
+            body = [(row[1], row[3]) for row in program[p2:address]]
+            limited = any(op == "DecrJumpZero" and to > address for op, to in body)
+            skips = any(op in SQLITE_JUMPS and to == address for op, to in body)
+            if limited and not skips:
+                walks.add(cursors.get(p1))
+    return walks
+
+
+def full_scans(sql):
+    """Таблицы, которые запрос читает целиком.
+
+    На SQLite это ``SCAN`` таблицы без индекса, кроме обхода в порядке
+    первичного ключа, который останавливает ``LIMIT`` без сортировки и
+    фильтра (keyset-пагинация читает только страницу); полное чтение с
+    сортировкой или фильтром и ``LIMIT`` сообщается. На PostgreSQL — узлы
+    ``Seq Scan``.
+    """
+    if connection.vendor == "postgresql":
+        return sorted(
+            {
+                node["Relation Name"]
+                for _, node in _walk(_postgresql_plan(sql))
+                if node["Node Type"] == "Seq Scan"
+            }
+        )
+    if connection.vendor != "sqlite":
+        return []
+
+    aliases = {alias: table for table, alias in TABLE_ALIAS.findall(sql)}
+    limited = _sqlite_limited_walks(sql)
+    tables = set()
+    for line in explain(sql):
+        match = SQLITE_SCAN.match(line)
+        if match is None:
+            continue
+        name = match.group(2) or match.group(1)
+        table = aliases.get(name, match.group(1))
+        if table not in limited:
+            tables.add(table)
+    return sorted(tables)
+
+
+def table_rows(table):
+    """Число строк таблицы (на PostgreSQL — оценка планировщика)."""
+    if connection.vendor == "postgresql":
+        return estimated_rows(table) or 0
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT COUNT(*) FROM {connection.ops.quote_name(table)}")
+        return cursor.fetchone()[0]
+
+
+def page_queries(client, url):
+    """SQL-запросы, которые выполняет страница (без повторов)."""
+    with CaptureQueriesContext(connection) as context:
+        client.get(url)
+    return list(dict.fromkeys(query["sql"] for query in context.captured_queries))
+
+
+def check_queries(queries, min_rows=0):
+    """Пары ``(sql, таблицы)`` для запросов с полным чтением таблиц.
+
+    Таблицы меньше ``min_rows`` строк не учитываются: для них полное чтение
+    дешевле индекса, и планировщик выбирает его сам.
+    """
+    sizes = {}
+    problems = []
+    for sql in queries:
+        if not sql.lstrip().upper().startswith(("SELECT", "WITH")):
+            continue
+        tables = []
+        for table in full_scans(sql):
+            if table not in sizes:
+                sizes[table] = table_rows(table)
+            if sizes[table] >= min_rows:
+                tables.append(table)
+        if tables:
+            problems.append((sql, tables))
+    return problems
@@ -0,0 +1,246 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .analytics import ITEM_AGGREGATES, increment_rows
+from .models import (
+    CENTS,
+    DashboardStats,
+    Order,
+    OrderItem,
+    Product,
+    ProductSales,
+    ProductSalesTotal,
+)
+
+# Периоды рейтинга: название -> число дней (None — за всё время)
+WINDOWS = {
+    "today": 1,
+    "7d": 7,
+    "30d": 30,
+    "all": None,
+}
+
+SALES_BATCH_SIZE = 2000
+
+# Вклад в продажи продукта: (units, orders, revenue)
+SALES_FIELDS = ("units", "orders", "revenue")
+ZERO = (0, 0, Decimal("0"))
+
+
+def sales_day(moment):
+    """День продаж для момента завершения заказа (в часовом поясе проекта)."""
+    return timezone.localdate(moment)
+
+
+def apply_sales(day, deltas):
+    """Прибавляет ``deltas`` (``{product_id: (units, orders, revenue)}``)
+    к продажам за день ``day`` и за всё время.
+    """
+    deltas = {
+        (product_id,): delta for product_id, delta in deltas.items() if any(delta)
+    }
+    if not deltas:
+        return
+    with transaction.atomic():
+        increment_rows(ProductSales, ("product_id",), SALES_FIELDS, deltas, day=day)
+        increment_rows(ProductSalesTotal, ("product_id",), SALES_FIELDS, deltas)
+    DashboardStats.recalculate_popular_product()
+
+
+def _order_lines(order_id, product_ids=None):
+    """Продажи заказа по продуктам: ``{product_id: (units, 1, revenue)}``."""
+    items = OrderItem.objects.filter(order_id=order_id)
+    if product_ids is not None:
+        items = items.filter(product_id__in=product_ids)
+    return {
+        product_id: (units, 1, revenue)
+        for product_id, units, revenue in items.values_list("product")
+        .annotate(
+            units=Sum("quantity"),
+            revenue=Sum(F("quantity") * F("product__price")),
+        )
+        .order_by()
+    }
+
+
+def _subtract(lines, product_id, units, revenue):
+    current = lines.get(product_id, ZERO)
+    units = current[0] - units
+    revenue = current[2] - revenue
+    lines[product_id] = (units, int(units > 0), revenue if units > 0 else 0)
+
+
+def record_orders_sales(order_ids, completed_at, sign):
+    """Добавляет (``sign=1``) или убирает (``sign=-1``) продажи заказов,
+    завершённых в момент ``completed_at``; позиции всех заказов
+    группируются по продуктам одним запросом."""
+    rows = (
+        OrderItem.objects.filter(order_id__in=order_ids)
+        .values_list("product")
+        .annotate(**ITEM_AGGREGATES)
+        .order_by()
+    )
+    apply_sales(
+        sales_day(completed_at),
+        {
+            product_id: (sign * units, sign * orders, sign * revenue)
+            for product_id, orders, units, revenue in rows
+        },
+    )
+
+
+def record_item_change(previous, current):
+    """Учитывает изменение позиции в продажах завершённых заказов.
+
+    ``previous`` и ``current`` — кортежи ``(order_id, product_id, quantity,
+    price)`` до и после изменения (``None``, если позиции не было). Состояние
+    заказа до изменения восстанавливается из текущего вычитанием новой
+    позиции и возвратом старой, так что продукт, встречающийся в заказе
+    несколько раз, считается в ``orders`` один раз.
+    """
+    lines = [line for line in (previous, current) if line is not None]
+    completed = dict(
+        Order.objects.filter(
+            pk__in={line[0] for line in lines},
+            status="Completed",
+            completed_at__isnull=False,
+        ).values_list("pk", "completed_at")
+    )
+    for order_id, completed_at in completed.items():
+        product_ids = {line[1] for line in lines if line[0] == order_id}
+        after = _order_lines(order_id, product_ids)
+        before = dict(after)
+        if current is not None and current[0] == order_id:
+            _subtract(before, current[1], current[2], current[2] * current[3])
+        if previous is not None and previous[0] == order_id:
+            _subtract(before, previous[1], -previous[2], -previous[2] * previous[3])
+        apply_sales(
+            sales_day(completed_at),
+            {
+                product_id: tuple(
+                    new - old
+                    for new, old in zip(
+                        after.get(product_id, ZERO), before.get(product_id, ZERO)
+                    )
+                )
+                for product_id in product_ids
+            },
+        )
+
+
+def rebuild_sales(product_ids=None, batch_size=SALES_BATCH_SIZE):
+    """Пересчитывает продажи с нуля по завершённым заказам.
+
+    ``product_ids`` ограничивает пересчёт продуктами (например, после смены
+    цены: выручка считается по текущей цене, как и стоимость заказа).
+    """
+    daily = ProductSales.objects.all()
+    totals = ProductSalesTotal.objects.all()
+    items = OrderItem.objects.filter(
+        order__status="Completed", order__completed_at__isnull=False
+    )
+    if product_ids is not None:
+        daily = daily.filter(product_id__in=product_ids)
+        totals = totals.filter(product_id__in=product_ids)
+        items = items.filter(product_id__in=product_ids)
+
+    rows = (
+        items.annotate(day=TruncDate("order__completed_at"))
+        .values_list("product", "day")
+        .annotate(
+            units=Sum("quantity"),
+            orders=Count("order", distinct=True),
+            revenue=Sum(F("quantity") * F("product__price")),
+        )
+        .order_by()
+    )
+    with transaction.atomic():
+        daily.delete()
+        totals.delete()
+        batch = []
+        for product_id, day, units, orders, revenue in rows.iterator(
+            chunk_size=batch_size
+        ):
+            batch.append(
+                ProductSales(
+                    product_id=product_id,
+                    day=day,
+                    units=units,
+                    orders=orders,
+                    revenue=revenue,
+                )
+            )
+            if len(batch) >= batch_size:
+                ProductSales.objects.bulk_create(batch)
+                batch = []
+        ProductSales.objects.bulk_create(batch)
+
+        totals_rows = (
+            ProductSales.objects.values_list("product")
+            .annotate(Sum("units"), Sum("orders"), Sum("revenue"))
+            .order_by()
+        )
+        if product_ids is not None:
+            totals_rows = totals_rows.filter(product_id__in=product_ids)
+        ProductSalesTotal.objects.bulk_create(
+            [
+                ProductSalesTotal(
+                    product_id=product_id, units=units, orders=orders, revenue=revenue
+                )
+                for product_id, units, orders, revenue in totals_rows
+            ],
+            batch_size=batch_size,
+        )
+    DashboardStats.recalculate_popular_product()
+
+
+def window_start(window):
+    """Первый день периода или ``None`` для рейтинга за всё время."""
+    if window not in WINDOWS:
+        raise ValueError(f"Неизвестный период: {window}")
+    days = WINDOWS[window]
+    if days is None:
+        return None
+    return timezone.localdate() - timedelta(days=days - 1)
+
+
+def top_products(window="all", limit=10):
+    """Самые продаваемые продукты за период, по числу проданных единиц.
+
+    Возвращает продукты с атрибутами ``units``, ``orders`` и ``revenue``.
+    За всё время читается начало индекса итоговой таблицы, за период —
+    только строки дневных продаж этого периода.
+    """
+    start = window_start(window)
+    if start is None:
+        rows = ProductSalesTotal.objects.filter(units__gt=0).values_list(
+            "product", "units", "orders", "revenue"
+        )
+    else:
+        rows = (
+            ProductSales.objects.filter(day__gte=start)
+            .values_list("product")
+            .annotate(
+                total_units=Sum("units"),
+                total_orders=Sum("orders"),
+                total_revenue=Sum("revenue"),
+            )
+            .filter(total_units__gt=0)
+            .order_by()
+        )
+    # Порядок совпадает с обратным обходом индекса (units, product)
+    ordering = ("-units" if start is None else "-total_units", "-product")
+    rows = list(rows.order_by(*ordering)[:limit])
+    products = Product.objects.only("name", "price").in_bulk([row[0] for row in rows])
+    ranking = []
+    for product_id, units, orders, revenue in rows:
+        product = products[product_id]
+        product.units, product.orders = units, orders
+        product.revenue = Decimal(revenue).quantize(CENTS)
+        ranking.append(product)
+    return ranking
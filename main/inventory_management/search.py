@@ -0,0 +1,86 @@
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Product
+
+# Полнотекстовый индекс создаётся миграцией 0010_product_search
+FTS_TABLE = "inventory_management_product_fts"
+PRODUCT_TABLE = Product._meta.db_table
+
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 50
+MAX_SEARCH_TERMS = 8
+
+
+def search_terms(query):
+    """Слова запроса в нижнем регистре (не более ``MAX_SEARCH_TERMS``)."""
+    return re.findall(r"\w+", (query or "").lower())[:MAX_SEARCH_TERMS]
+
+
+def _match_expression(terms):
+    """Выражение поиска для текущей БД: все слова, каждое как префикс."""
+    if connection.vendor == "sqlite":
+        return " ".join(f'"{term}"*' for term in terms)
+    if connection.vendor == "postgresql":
+        return " & ".join(f"{term}:*" for term in terms)
+    return None
+
+
+def matching_product_ids(query):
+    """Подзапрос с id продуктов, подходящих под запрос, — для ``pk__in``.
+
+    Возвращает ``None``, если в запросе нет слов или у БД нет индекса.
+    """
+    terms = search_terms(query)
+    match = _match_expression(terms) if terms else None
+    if match is None:
+        return None
+    if connection.vendor == "sqlite":
+        return RawSQL(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match]
+        )
+    return RawSQL(
+        f"SELECT id FROM {PRODUCT_TABLE} "
+        f"WHERE search_vector @@ to_tsquery('russian', %s)",
+        [match],
+    )
+
+
+def search_products(query, limit=DEFAULT_SEARCH_LIMIT):
+    """Продукты, отсортированные по релевантности.
+
+    Название весит больше описания. На SQLite и PostgreSQL поиск идёт по
+    полнотекстовому индексу; на других БД — без индекса и ранжирования.
+    Продукт с артикулом, равным запросу, идёт первым (поиск по уникальному
+    индексу артикула).
+    """
+    terms = search_terms(query)
+    if not terms:
+        return []
+    match = _match_expression(terms)
+    by_sku = list(Product.objects.filter(sku=query.strip())[:1])
+
+    if connection.vendor == "sqlite":
+        products = Product.objects.raw(
+            f"SELECT p.* FROM {PRODUCT_TABLE} p "
+            f"JOIN {FTS_TABLE} ON {FTS_TABLE}.rowid = p.id "
+            f"WHERE {FTS_TABLE} MATCH %s "
+            f"ORDER BY bm25({FTS_TABLE}, 10.0, 1.0), p.id LIMIT %s",
+            [match, limit],
+        )
+    elif connection.vendor == "postgresql":
+        products = Product.objects.raw(
+            f"SELECT p.* FROM {PRODUCT_TABLE} p, to_tsquery('russian', %s) query "
+            f"WHERE p.search_vector @@ query "
+            f"ORDER BY ts_rank_cd(p.search_vector, query) DESC, p.id LIMIT %s",
+            [match, limit],
+        )
+    else:
+        condition = Q()
+        for term in terms:
+            condition &= Q(name__icontains=term) | Q(description__icontains=term)
+        products = Product.objects.filter(condition).order_by("id")[:limit]
+    return (by_sku + [product for product in products if product not in by_sku])[:limit]
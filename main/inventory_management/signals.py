@@ -0,0 +1,354 @@
+from django.conf import settings
+from django.db import models
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import (
+    STATUS_COUNTERS,
+    DashboardStats,
+    Order,
+    OrderItem,
+    Product,
+    StockMovement,
+    Warehouse,
+    WarehouseProduct,
+    current_month_start,
+)
+from .analytics import (
+    move_orders,
+    record_order_item_change,
+    record_price_changes,
+)
+from .fragments import evict_fragments, evict_stock_fragments
+from .sales import rebuild_sales, record_item_change, record_orders_sales, sales_day
+from .stock import record_movements, release_item
+
+
+def _remember_previous(instance, *fields):
+    """Сохраняет на объекте значения полей из БД до изменения."""
+    previous = None
+    if instance.pk is not None:
+        previous = type(instance).objects.filter(pk=instance.pk).values(*fields).first()
+    instance._previous = previous
+
+
+def _deleted_directly(origin, model):
+    """Удаление вызвано самим объектом модели, а не каскадом от родителя."""
+    if isinstance(origin, models.QuerySet):
+        return origin.model is model
+    return isinstance(origin, model)
+
+
+def _counts_for_month_income(order):
+    """Учитывается ли заказ в доходе за текущий месяц (без учёта статуса)."""
+    return order.created_at is not None and order.created_at >= current_month_start()
+
+
+def _order_income(order_id):
+    return Order.objects.filter(pk=order_id).values_list("total", flat=True).first()
+
+
+@receiver(pre_save, sender=Product)
+def product_pre_save(sender, instance, raw, **kwargs):
+    if not raw:
+        _remember_previous(instance, "price")
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    if created:
+        DashboardStats.adjust(products_amount=1)
+        return
+
+    if instance._previous and instance._previous["price"] != instance.price:
+        # Цена влияет на стоимость всех заказов с этим продуктом
+        Order.objects.filter(items__product=instance).refresh_totals()
+        # Выручка в продажах и итогах считается по текущей цене, как и
+        # стоимость заказа
+        rebuild_sales([instance.pk])
+        record_price_changes(
+            {instance.pk: instance.price - instance._previous["price"]}
+        )
+        # Доход за месяц читается из дневных итогов, поэтому после них
+        DashboardStats.recalculate_month_income()
+
+    # Название и цена продукта выводятся в строках складов и заказов
+    evict_fragments("product", [instance.pk])
+    evict_fragments(
+        "warehouse",
+        WarehouseProduct.objects.filter(product=instance).values_list(
+            "warehouse_id", flat=True
+        ),
+    )
+    evict_fragments(
+        "order",
+        OrderItem.objects.filter(product=instance).values_list("order_id", flat=True),
+    )
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    DashboardStats.adjust(products_amount=-1)
+    evict_fragments("product", [instance.pk])
+    # Позиции заказов уже удалены каскадом, ссылка на продукт обнулена
+    if not DashboardStats.objects.filter(most_popular_product__isnull=False).exists():
+        DashboardStats.recalculate_popular_product()
+
+
+@receiver(post_save, sender=Warehouse)
+def warehouse_saved(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    if created:
+        DashboardStats.adjust(warehouses_amount=1)
+    else:
+        # Название склада выводится в строках его продуктов
+        evict_fragments("warehouse", [instance.pk])
+        evict_fragments(
+            "product",
+            WarehouseProduct.objects.filter(warehouse=instance).values_list(
+                "product_id", flat=True
+            ),
+        )
+
+
+@receiver(post_delete, sender=Warehouse)
+def warehouse_deleted(sender, instance, **kwargs):
+    DashboardStats.adjust(warehouses_amount=-1)
+    evict_fragments("warehouse", [instance.pk])
+
+
+@receiver(pre_save, sender=WarehouseProduct)
+def warehouse_product_pre_save(sender, instance, raw, **kwargs):
+    if not raw:
+        _remember_previous(instance, "quantity", "reorder_level")
+
+
+@receiver(post_save, sender=WarehouseProduct)
+def warehouse_product_saved(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    previous = instance._previous
+    previous_quantity = previous["quantity"] if previous else 0
+    was_low = bool(previous and previous_quantity < previous["reorder_level"])
+    is_low = int(instance.quantity) < int(instance.reorder_level)
+    DashboardStats.adjust(low_stock_products=int(is_low) - int(was_low))
+    evict_stock_fragments([(instance.warehouse_id, instance.product_id)])
+
+    # Изменение остатка через save() (форма, админка) тоже попадает в журнал
+    record_movements(
+        [
+            StockMovement(
+                warehouse_id=instance.warehouse_id,
+                product_id=instance.product_id,
+                kind=StockMovement.RECEIPT if created else StockMovement.ADJUSTMENT,
+                quantity=int(instance.quantity) - previous_quantity,
+            )
+        ]
+    )
+
+
+@receiver(post_delete, sender=WarehouseProduct)
+def warehouse_product_deleted(sender, instance, origin=None, **kwargs):
+    if instance.quantity < instance.reorder_level:
+        DashboardStats.adjust(low_stock_products=-1)
+    evict_stock_fragments([(instance.warehouse_id, instance.product_id)])
+    # При каскадном удалении склада или продукта журнал удаляется вместе с ними
+    if _deleted_directly(origin, sender):
+        record_movements(
+            [
+                StockMovement(
+                    warehouse_id=instance.warehouse_id,
+                    product_id=instance.product_id,
+                    kind=StockMovement.ADJUSTMENT,
+                    quantity=-instance.quantity,
+                )
+            ]
+        )
+
+
+def _completed_day(status, completed_at):
+    """День продаж заказа или ``None``, если заказ не завершён."""
+    if status == "Completed" and completed_at is not None:
+        return sales_day(completed_at)
+    return None
+
+
+@receiver(pre_save, sender=Order)
+def order_pre_save(sender, instance, raw, **kwargs):
+    if raw:
+        return
+    _remember_previous(instance, "status", "completed_at")
+    if instance.status != "Completed":
+        instance.completed_at = None
+    elif instance.completed_at is None:
+        instance.completed_at = timezone.now()
+
+
+@receiver(post_save, sender=Order)
+def order_saved(sender, instance, raw, **kwargs):
+    if raw:
+        return
+    evict_fragments("order", [instance.pk])
+    previous = instance._previous or {"status": None, "completed_at": None}
+
+    # Продажи записываются на день завершения заказа
+    old_day = _completed_day(previous["status"], previous["completed_at"])
+    new_day = _completed_day(instance.status, instance.completed_at)
+    if old_day != new_day:
+        if old_day is not None:
+            record_orders_sales([instance.pk], previous["completed_at"], -1)
+        if new_day is not None:
+            record_orders_sales([instance.pk], instance.completed_at, 1)
+
+    old_status = previous["status"]
+    if old_status == instance.status:
+        return
+    move_orders([instance.pk], old_status, instance.status)
+
+    deltas = {}
+    for status, sign in ((old_status, -1), (instance.status, 1)):
+        field = STATUS_COUNTERS.get(status)
+        if field:
+            deltas[field] = deltas.get(field, 0) + sign
+
+    if "Completed" in (old_status, instance.status) and _counts_for_month_income(
+        instance
+    ):
+        income = _order_income(instance.pk)
+        deltas["month_income"] = income if instance.status == "Completed" else -income
+
+    DashboardStats.adjust(**deltas)
+
+
+@receiver(pre_delete, sender=Order)
+def order_pre_delete(sender, instance, **kwargs):
+    # Позиции ещё не удалены: продажи заказа убираются целиком, а не по
+    # одной позиции (продукт может встречаться в заказе несколько раз).
+    # Статус берётся из БД: удаляемый объект может быть устаревшим
+    status, completed_at = (
+        Order.objects.filter(pk=instance.pk)
+        .values_list("status", "completed_at")
+        .first()
+    ) or (None, None)
+    if _completed_day(status, completed_at) is not None:
+        record_orders_sales([instance.pk], completed_at, -1)
+    if status is not None:
+        move_orders([instance.pk], status, None)
+
+
+@receiver(post_delete, sender=Order)
+def order_deleted(sender, instance, **kwargs):
+    evict_fragments("order", [instance.pk])
+    # Доход уже уменьшен сигналами удалённых каскадом позиций
+    field = STATUS_COUNTERS.get(instance.status)
+    if field:
+        DashboardStats.adjust(**{field: -1})
+
+
+@receiver(pre_save, sender=OrderItem)
+def order_item_pre_save(sender, instance, raw, **kwargs):
+    if not raw:
+        _remember_previous(
+            instance,
+            "quantity",
+            "order_id",
+            "product_id",
+            "warehouse_id",
+            "product__price",
+        )
+
+
+@receiver(post_save, sender=OrderItem)
+def order_item_saved(sender, instance, raw, **kwargs):
+    if raw:
+        return
+    previous = instance._previous
+    order_ids = {instance.order_id}
+    if previous:
+        order_ids.add(previous["order_id"])
+    Order.objects.filter(pk__in=order_ids).refresh_totals()
+    evict_fragments("order", order_ids)
+
+    order = instance.order
+
+    if order.status == "Completed" and _counts_for_month_income(order):
+        income = instance.product.price * int(instance.quantity)
+        if previous:
+            income -= previous["product__price"] * previous["quantity"]
+        DashboardStats.adjust(month_income=income)
+
+    record_item_change(
+        previous
+        and (
+            previous["order_id"],
+            previous["product_id"],
+            previous["quantity"],
+            previous["product__price"],
+        ),
+        (
+            instance.order_id,
+            instance.product_id,
+            int(instance.quantity),
+            instance.product.price,
+        ),
+    )
+    record_order_item_change(
+        previous
+        and (
+            previous["order_id"],
+            previous["warehouse_id"],
+            previous["quantity"],
+            previous["product__price"],
+        ),
+        (
+            instance.order_id,
+            instance.warehouse_id,
+            int(instance.quantity),
+            instance.product.price,
+        ),
+    )
+
+
+@receiver(post_delete, sender=OrderItem)
+def order_item_deleted(sender, instance, origin=None, **kwargs):
+    Order.objects.filter(pk=instance.order_id).refresh_totals()
+    evict_fragments("order", [instance.order_id])
+    order = Order.objects.filter(pk=instance.order_id).first()
+    if order is not None and order.status == "Pending":
+        release_item(instance)
+    product = Product.objects.filter(pk=instance.product_id).first()
+    if (
+        order is not None
+        and order.status == "Completed"
+        and _counts_for_month_income(order)
+        and product is not None
+    ):
+        DashboardStats.adjust(month_income=-product.price * instance.quantity)
+    # Продажи и итоги удалённого заказа убраны до удаления позиций
+    if product is None or _deleted_directly(origin, Order):
+        return
+    record_order_item_change(
+        (instance.order_id, instance.warehouse_id, instance.quantity, product.price),
+        None,
+    )
+    # Продажи удалённого продукта удаляются каскадом
+    if not _deleted_directly(origin, Product):
+        record_item_change(
+            (instance.order_id, instance.product_id, instance.quantity, product.price),
+            None,
+        )
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def user_saved(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        DashboardStats.adjust(total_users=1)
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def user_deleted(sender, instance, **kwargs):
+    DashboardStats.adjust(total_users=-1)
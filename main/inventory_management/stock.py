@@ -0,0 +1,576 @@
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+
+from django.db import IntegrityError, transaction
+from django.db.models import (
+    Case,
+    Exists,
+    F,
+    Max,
+    OuterRef,
+    Q,
+    Subquery,
+    Sum,
+    Value,
+    When,
+)
+from django.utils import timezone
+
+from .analytics import move_orders, record_new_items
+from .fragments import evict_fragments, evict_stock_fragments
+from .models import (
+    DashboardStats,
+    Order,
+    OrderItem,
+    Product,
+    StockMovement,
+    StockSnapshot,
+    VersionConflictError,
+    WarehouseProduct,
+    current_month_start,
+)
+from .sales import record_orders_sales
+
+
+class InsufficientStockError(Exception):
+    """Свободного остатка не хватает для операции со складом."""
+
+    def __init__(self, product, requested, available):
+        self.product = product
+        self.requested = requested
+        self.available = available
+        super().__init__(
+            f"Недостаточно товара «{product}»: запрошено {requested}, "
+            f"доступно {available}"
+        )
+
+
+def merge_lines(product_ids, quantities):
+    """Собирает позиции заказа в словарь ``{product_id: quantity}``.
+
+    Повторяющиеся продукты складываются. Если указано одно количество,
+    оно применяется ко всем выбранным продуктам.
+    """
+    product_ids = [int(product_id) for product_id in product_ids]
+    quantities = [int(quantity) for quantity in quantities]
+    if len(quantities) == 1:
+        quantities *= len(product_ids)
+    if len(quantities) != len(product_ids) or min(quantities, default=0) < 1:
+        raise ValueError("Некорректные количества товаров")
+
+    lines = defaultdict(int)
+    for product_id, quantity in zip(product_ids, quantities):
+        lines[product_id] += quantity
+    return dict(lines)
+
+
+class StockLevelError(Exception):
+    """Новый остаток нарушает ограничения (отрицательный или меньше резерва)."""
+
+
+def parse_stock_input(raw, current):
+    """Разбирает значение поля остатка из формы.
+
+    ``"12"`` — новое абсолютное значение, ``"+5"`` / ``"-3"`` — изменение
+    относительно текущего остатка. Возвращает ``("set", value)``,
+    ``("add", delta)`` или ``None``, если менять нечего.
+    """
+    raw = (raw or "").strip().replace("−", "-")
+    if not raw:
+        return None
+    if raw[0] in "+-":
+        delta = int(raw)
+        return ("add", delta) if delta else None
+    value = int(raw)
+    if value < 0:
+        raise ValueError("Количество не может быть отрицательным")
+    return ("set", value) if value != current else None
+
+
+def record_movements(movements):
+    """Добавляет записи в журнал движения одним INSERT (без нулевых).
+
+    Каждое изменение остатка проходит через журнал, поэтому здесь же
+    удаляются закешированные строки затронутых продуктов и складов.
+    """
+    movements = [movement for movement in movements if movement.quantity]
+    evict_stock_fragments(
+        (movement.warehouse_id, movement.product_id) for movement in movements
+    )
+    return StockMovement.objects.bulk_create(movements)
+
+
+def update_stock_levels(changes):
+    """Применяет изменения остатков одним ``UPDATE ... CASE``.
+
+    ``changes`` — словарь ``{warehouse_product_pk: ("set" | "add", value)}``.
+    Изменения вида ``add`` выполняются через ``F("quantity") + delta``,
+    поэтому параллельные корректировки складываются, а не перезаписывают
+    друг друга. Строки с ``set`` записываются, только если их версия не
+    изменилась с момента чтения (иначе :class:`VersionConflictError`), так
+    что корректировка в журнале посчитана от того остатка, который
+    перезаписан, — без блокировки строк. Записываются только переданные
+    строки; каждое изменение попадает в журнал как корректировка.
+    """
+    if not changes:
+        return 0
+    whens = [
+        When(
+            pk=pk,
+            then=Value(value) if operation == "set" else F("quantity") + value,
+        )
+        for pk, (operation, value) in changes.items()
+    ]
+    try:
+        with transaction.atomic():
+            rows = WarehouseProduct.objects.filter(pk__in=changes).values_list(
+                "pk", "warehouse_id", "product_id", "quantity", "version"
+            )
+            movements = []
+            conditions = []
+            for pk, warehouse_id, product_id, quantity, version in rows:
+                operation, value = changes[pk]
+                conditions.append(
+                    Q(pk=pk, version=version) if operation == "set" else Q(pk=pk)
+                )
+                movements.append(
+                    StockMovement(
+                        warehouse_id=warehouse_id,
+                        product_id=product_id,
+                        kind=StockMovement.ADJUSTMENT,
+                        quantity=value - quantity if operation == "set" else value,
+                    )
+                )
+
+            if not conditions:
+                return 0
+            updated = WarehouseProduct.objects.filter(reduce(or_, conditions)).update(
+                quantity=Case(
+                    *whens,
+                    default=F("quantity"),
+                    output_field=WarehouseProduct._meta.get_field("quantity"),
+                ),
+                version=F("version") + 1,
+            )
+            if updated != len(movements):
+                raise VersionConflictError(WarehouseProduct, changes)
+            record_movements(movements)
+    except IntegrityError:
+        raise StockLevelError(
+            "Остаток не может быть отрицательным или меньше зарезервированного"
+        )
+    DashboardStats.refresh_low_stock()
+    return updated
+
+
+def update_reorder_levels(levels):
+    """Меняет пороги низкого запаса одним ``UPDATE ... CASE``.
+
+    ``levels`` — словарь ``{warehouse_product_pk: reorder_level}``. Флаг
+    ``is_low_stock`` пересчитывает сама БД.
+    """
+    if not levels:
+        return 0
+    updated = WarehouseProduct.objects.filter(pk__in=levels).update(
+        reorder_level=Case(
+            *[When(pk=pk, then=Value(level)) for pk, level in levels.items()],
+            default=F("reorder_level"),
+            output_field=WarehouseProduct._meta.get_field("reorder_level"),
+        ),
+        version=F("version") + 1,
+    )
+    DashboardStats.refresh_low_stock()
+    return updated
+
+
+def transfer_stock(source, warehouse, quantity):
+    """Перемещает ``quantity`` единиц со строки остатка ``source`` на склад.
+
+    Списание выполняется условным ``UPDATE``, чтобы не тронуть резерв;
+    строка остатка на складе-получателе создаётся при необходимости
+    (``INSERT`` с ``ignore_conflicts``, безопасно при параллельном создании).
+    """
+    if quantity < 1:
+        raise ValueError("Количество для перемещения должно быть положительным")
+    if warehouse.pk == source.warehouse_id:
+        raise ValueError("Склады отправителя и получателя совпадают")
+
+    with transaction.atomic():
+        taken = WarehouseProduct.objects.filter(
+            pk=source.pk, quantity__gte=F("reserved") + quantity
+        ).update(quantity=F("quantity") - quantity, version=F("version") + 1)
+        if not taken:
+            source.refresh_from_db()
+            raise InsufficientStockError(source.product, quantity, source.available)
+
+        # Строку получателя мог параллельно создать другой запрос: вставка
+        # с ignore_conflicts не падает на ограничении уникальности, а
+        # приход записывается в ту строку, которая есть. Сигналы вставка не
+        # вызывает — журнал и счётчик низкого запаса обновляются ниже
+        WarehouseProduct.objects.bulk_create(
+            [
+                WarehouseProduct(
+                    warehouse=warehouse, product_id=source.product_id, quantity=0
+                )
+            ],
+            ignore_conflicts=True,
+        )
+        WarehouseProduct.objects.filter(
+            warehouse=warehouse, product_id=source.product_id
+        ).update(quantity=F("quantity") + quantity, version=F("version") + 1)
+        record_movements(
+            [
+                StockMovement(
+                    warehouse_id=source.warehouse_id,
+                    product_id=source.product_id,
+                    kind=StockMovement.TRANSFER,
+                    quantity=-quantity,
+                ),
+                StockMovement(
+                    warehouse=warehouse,
+                    product_id=source.product_id,
+                    kind=StockMovement.TRANSFER,
+                    quantity=quantity,
+                ),
+            ]
+        )
+    DashboardStats.refresh_low_stock()
+
+
+def place_order(lines):
+    """Создаёт заказ и резервирует под него остатки на складах.
+
+    ``lines`` — словарь ``{product_id: quantity}``. Продукты загружаются
+    одним ``in_bulk``, строки остатков блокируются одним
+    ``SELECT ... FOR UPDATE``, позиции вставляются одним ``bulk_create``,
+    резерв записывается одним ``bulk_update``. Всё выполняется в одной
+    транзакции: если остатка не хватает, заказ не создаётся. Позиция,
+    которую не покрывает один склад, делится между несколькими.
+    """
+    with transaction.atomic():
+        products = Product.objects.in_bulk(lines)
+        missing = set(lines) - set(products)
+        if missing:
+            raise Product.DoesNotExist(f"Продукты не найдены: {sorted(missing)}")
+
+        stock = defaultdict(list)
+        rows = (
+            WarehouseProduct.objects.select_for_update()
+            .filter(product_id__in=lines)
+            .order_by("pk")
+        )
+        for row in rows:
+            stock[row.product_id].append(row)
+
+        order = Order.objects.create(status="Pending")
+        items = []
+        reserved_rows = []
+        for product_id, quantity in lines.items():
+            candidates = sorted(
+                stock[product_id], key=lambda row: row.available, reverse=True
+            )
+            available = sum(max(row.available, 0) for row in candidates)
+            if available < quantity:
+                raise InsufficientStockError(products[product_id], quantity, available)
+
+            remaining = quantity
+            for row in candidates:
+                taken = min(row.available, remaining)
+                if taken <= 0:
+                    break
+                row.reserved += taken
+                row.version += 1
+                remaining -= taken
+                reserved_rows.append(row)
+                items.append(
+                    OrderItem(
+                        order=order,
+                        product=products[product_id],
+                        warehouse_id=row.warehouse_id,
+                        quantity=taken,
+                    )
+                )
+
+        # Массовые операции не вызывают сигналы — обновляем производные данные сами
+        OrderItem.objects.bulk_create(items)
+        WarehouseProduct.objects.bulk_update(reserved_rows, ["reserved", "version"])
+        Order.objects.filter(pk=order.pk).refresh_totals()
+        record_new_items(order)
+
+    order.refresh_from_db(fields=["total"])
+    return order
+
+
+def _stock_row(item):
+    return WarehouseProduct.objects.filter(
+        warehouse_id=item.warehouse_id, product_id=item.product_id
+    )
+
+
+def release_item(item):
+    """Снимает резерв позиции незавершённого заказа (например, при удалении)."""
+    if item.warehouse_id is not None:
+        _stock_row(item).update(
+            reserved=F("reserved") - item.quantity, version=F("version") + 1
+        )
+
+
+def _take_for_item(item, delta):
+    """Меняет на ``delta`` резерв (заказ в ожидании) или остаток строки
+    склада позиции. Увеличение выполняется условным ``UPDATE ... WHERE``,
+    поэтому параллельные изменения не могут увести свободный остаток в минус.
+    """
+    if not delta or item.warehouse_id is None:
+        return
+    field = "reserved" if item.order.status == "Pending" else "quantity"
+    sign = 1 if field == "reserved" else -1
+    rows = _stock_row(item)
+    if delta > 0:
+        rows = rows.filter(quantity__gte=F("reserved") + delta)
+    changed = rows.update(**{field: F(field) + sign * delta}, version=F("version") + 1)
+    if not changed and delta > 0:
+        row = _stock_row(item).first()
+        raise InsufficientStockError(item.product, delta, row.available if row else 0)
+    if field == "quantity":
+        record_movements(
+            [
+                StockMovement(
+                    warehouse_id=item.warehouse_id,
+                    product_id=item.product_id,
+                    kind=StockMovement.SHIPMENT,
+                    quantity=-delta,
+                    order_id=item.order_id,
+                )
+            ]
+        )
+        DashboardStats.refresh_low_stock()
+
+
+def add_order_item(item):
+    """Сохраняет новую позицию заказа и занимает под неё товар на складе.
+
+    Для заказа в ожидании товар резервируется, для остальных —
+    списывается (с записью отгрузки в журнал); если свободного остатка не
+    хватает, бросается :class:`InsufficientStockError` и позиция не
+    сохраняется. Так позиции, добавленные не через :func:`place_order`
+    (например, в админке), снимаются с резерва при удалении корректно.
+    """
+    if item.quantity < 1:
+        raise ValueError("Количество товара должно быть положительным")
+    with transaction.atomic():
+        _take_for_item(item, item.quantity)
+        item.save()
+    return item
+
+
+def change_item_quantity(item, new_quantity):
+    """Меняет количество в позиции заказа вместе с остатком на складе.
+
+    Для незавершённого заказа меняется резерв, для завершённого — сам
+    остаток (с записью отгрузки в журнал), так же как при добавлении
+    позиции. Позиция сохраняется с проверкой версии
+    (:class:`VersionConflictError`).
+    """
+    if new_quantity < 1:
+        raise ValueError("Количество товара должно быть положительным")
+
+    _take_for_item(item, new_quantity - item.quantity)
+    item.quantity = new_quantity
+    item.save()
+
+
+def set_order_status(order, status):
+    """Меняет статус заказа и списывает (или возвращает) зарезервированный товар.
+
+    При завершении заказа резерв превращается в списание со склада
+    (отгрузка в журнале), при возврате в «Ожидание» товар снова
+    приходует и резервируется. Заказ сохраняется первым и только если его
+    версия совпадает с версией ``order``: если статус успели сменить
+    параллельно, бросается :class:`VersionConflictError` и остатки не
+    меняются. Строка заказа при этом не блокируется на время чтения.
+    """
+    if status not in dict(Order._meta.get_field("status").choices):
+        raise ValueError(f"Неизвестный статус заказа: {status}")
+
+    previous = order.status
+    if previous == status:
+        return order
+
+    with transaction.atomic():
+        order.status = status
+        order.save()
+
+        if "Completed" in (previous, status):
+            sign = -1 if status == "Completed" else 1
+            movements = []
+            for item in order.items.filter(warehouse__isnull=False):
+                _stock_row(item).update(
+                    quantity=F("quantity") + sign * item.quantity,
+                    reserved=F("reserved") + sign * item.quantity,
+                    version=F("version") + 1,
+                )
+                movements.append(
+                    StockMovement(
+                        warehouse_id=item.warehouse_id,
+                        product_id=item.product_id,
+                        kind=StockMovement.SHIPMENT,
+                        quantity=sign * item.quantity,
+                        order=order,
+                    )
+                )
+            record_movements(movements)
+            DashboardStats.refresh_low_stock()
+    return order
+
+
+def complete_orders(order_ids):
+    """Завершает ожидающие заказы из ``order_ids`` и списывает их резерв.
+
+    Статус меняется одним условным ``UPDATE`` (заказы, уже ушедшие из
+    «Ожидания», пропускаются), остатки — одним ``UPDATE`` с коррелированным
+    подзапросом, который суммирует позиции выбранных заказов по паре
+    склад/продукт. Отгрузки пишутся в журнал одним INSERT. Массовые операции
+    не вызывают сигналы, поэтому счётчики дашборда, продажи и дневные итоги
+    обновляются здесь же сгруппированными запросами. Всё выполняется в одной
+    транзакции; возвращает число завершённых заказов.
+    """
+    with transaction.atomic():
+        order_ids = list(
+            Order.objects.select_for_update()
+            .filter(pk__in=order_ids, status="Pending")
+            .values_list("pk", flat=True)
+        )
+        if not order_ids:
+            return 0
+
+        items = OrderItem.objects.filter(
+            order_id__in=order_ids, warehouse__isnull=False
+        )
+        same_row = items.filter(
+            warehouse_id=OuterRef("warehouse_id"), product_id=OuterRef("product_id")
+        )
+        shipped = Subquery(
+            same_row.values("warehouse_id", "product_id")
+            .annotate(total=Sum("quantity"))
+            .values("total")
+        )
+        try:
+            with transaction.atomic():
+                # Условие по продуктам позволяет читать остатки по индексу,
+                # а не проверять подзапросом каждую строку таблицы
+                WarehouseProduct.objects.filter(
+                    Exists(same_row), product_id__in=items.values("product_id")
+                ).update(
+                    quantity=F("quantity") - shipped,
+                    reserved=F("reserved") - shipped,
+                    version=F("version") + 1,
+                )
+        except IntegrityError:
+            raise StockLevelError("Остатка на складе не хватает для завершения заказов")
+
+        now = timezone.now()
+        completed = Order.objects.filter(pk__in=order_ids, status="Pending").update(
+            status="Completed",
+            completed_at=now,
+            updated_at=now,
+            version=F("version") + 1,
+        )
+        record_movements(
+            StockMovement(
+                warehouse_id=warehouse_id,
+                product_id=product_id,
+                kind=StockMovement.SHIPMENT,
+                quantity=-quantity,
+                order_id=order_id,
+            )
+            for order_id, warehouse_id, product_id, quantity in items.values_list(
+                "order_id", "warehouse_id", "product_id", "quantity"
+            )
+        )
+
+        # То же, что сигналы делают для одного заказа в order_saved
+        month_income = Order.objects.filter(
+            pk__in=order_ids, created_at__gte=current_month_start()
+        ).aggregate(income=Sum("total", default=0))["income"]
+        DashboardStats.adjust(
+            active_orders_amount=-completed,
+            completed_orders_amount=completed,
+            month_income=month_income,
+        )
+        record_orders_sales(order_ids, now, 1)
+        move_orders(order_ids, "Pending", "Completed")
+        evict_fragments("order", order_ids)
+    DashboardStats.refresh_low_stock()
+    return completed
+
+
+def take_snapshot(batch_size=1000):
+    """Сохраняет снимок остатков всех пар склад/продукт.
+
+    Снимок строится по журналу: к предыдущему снимку прибавляются суммы
+    движений, появившихся после него. Возвращает число записанных строк.
+    """
+    with transaction.atomic():
+        watermark = StockMovement.objects.aggregate(last=Max("pk"))["last"]
+        previous = StockSnapshot.objects.aggregate(last=Max("last_movement_id"))["last"]
+        if watermark is None or watermark == previous:
+            return 0
+
+        balances = {}
+        movements = StockMovement.objects.filter(pk__lte=watermark)
+        if previous is not None:
+            snapshot_rows = StockSnapshot.objects.filter(last_movement_id=previous)
+            for warehouse_id, product_id, quantity in snapshot_rows.values_list(
+                "warehouse_id", "product_id", "quantity"
+            ).iterator(chunk_size=batch_size):
+                balances[warehouse_id, product_id] = quantity
+            movements = movements.filter(pk__gt=previous)
+
+        deltas = (
+            movements.values_list("warehouse_id", "product_id")
+            .annotate(delta=Sum("quantity"))
+            .order_by()
+        )
+        for warehouse_id, product_id, delta in deltas:
+            key = warehouse_id, product_id
+            balances[key] = balances.get(key, 0) + delta
+
+        taken_at = timezone.now()
+        StockSnapshot.objects.bulk_create(
+            [
+                StockSnapshot(
+                    warehouse_id=warehouse_id,
+                    product_id=product_id,
+                    quantity=quantity,
+                    last_movement_id=watermark,
+                    taken_at=taken_at,
+                )
+                for (warehouse_id, product_id), quantity in balances.items()
+            ],
+            batch_size=batch_size,
+        )
+    return len(balances)
+
+
+def quantity_at(warehouse_id, product_id, moment):
+    """Остаток пары склад/продукт на момент ``moment``.
+
+    Берётся ближайший предыдущий снимок и к нему прибавляются только
+    движения после него, а не весь журнал.
+    """
+    snapshot = (
+        StockSnapshot.objects.filter(
+            warehouse_id=warehouse_id, product_id=product_id, taken_at__lte=moment
+        )
+        .order_by("-taken_at")
+        .first()
+    )
+    movements = StockMovement.objects.filter(
+        warehouse_id=warehouse_id, product_id=product_id, created_at__lte=moment
+    )
+    quantity = 0
+    if snapshot is not None:
+        quantity = snapshot.quantity
+        movements = movements.filter(pk__gt=snapshot.last_movement_id)
+    return quantity + movements.aggregate(total=Sum("quantity", default=0))["total"]
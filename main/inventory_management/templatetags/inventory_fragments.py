@@ -0,0 +1,45 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from ..fragments import set_fragment
+
+register = template.Library()
+
+
+class FragmentNode(template.Node):
+    def __init__(self, nodelist, name, pk, stamp):
+        self.nodelist = nodelist
+        self.name = name
+        self.pk = pk
+        self.stamp = stamp
+
+    def render(self, context):
+        name = self.name.resolve(context)
+        pk = self.pk.resolve(context)
+        # Представление заранее загрузило готовые фрагменты страницы
+        cached = context.get("fragments", {}).get(pk)
+        if cached is not None:
+            return mark_safe(cached)
+        html = self.nodelist.render(context)
+        set_fragment(name, pk, self.stamp.resolve(context), html)
+        return html
+
+
+@register.tag
+def fragment(parser, token):
+    """Кеширует строку списка:
+    ``{% fragment "product" product.pk stamp %}...{% endfragment %}``.
+
+    ``stamp`` — отметка версии строки, по которой она отрендерена.
+    Фрагменты страницы загружаются представлением одним запросом к кешу
+    (только с текущей отметкой) и передаются в контексте как ``fragments``;
+    отсутствующие рендерятся и сохраняются.
+    """
+    bits = token.split_contents()
+    if len(bits) != 4:
+        raise template.TemplateSyntaxError(
+            f"{bits[0]} ожидает имя фрагмента, первичный ключ и отметку версии"
+        )
+    nodelist = parser.parse(("endfragment",))
+    parser.delete_first_token()
+    return FragmentNode(nodelist, *[parser.compile_filter(bit) for bit in bits[1:]])
@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 app_name = "inventory_management"
 
@@ -7,12 +7,40 @@ urlpatterns = [
     path("", views.MainView.as_view(), name="main"),
     path("orders/", views.OrderListView.as_view(), name="orders"),
     path("orders/<int:pk>", views.OrderView.as_view(), name="order"),
+    path(
+        "orders/complete/",
+        views.OrderCompleteView.as_view(),
+        name="complete_orders",
+    ),
     path("create_order/", views.OrderCreateView.as_view(), name="create_order"),
     path("products/", views.ProductListView.as_view(), name="products"),
     path("products/<int:pk>", views.ProductView.as_view(), name="product"),
+    path("products/search/", views.ProductSearchView.as_view(), name="product_search"),
+    path("products/top/", views.TopProductsView.as_view(), name="top_products"),
+    path("api/products/", api.ProductListApiView.as_view(), name="product_list_api"),
+    path("api/orders/", api.OrderListApiView.as_view(), name="order_list_api"),
+    path(
+        "api/warehouses/",
+        api.WarehouseListApiView.as_view(),
+        name="warehouse_list_api",
+    ),
+    path(
+        "api/products/search/",
+        views.ProductSearchApiView.as_view(),
+        name="product_search_api",
+    ),
+    path("analytics/", views.AnalyticsView.as_view(), name="analytics"),
+    path(
+        "api/analytics/daily/",
+        views.AnalyticsApiView.as_view(),
+        name="analytics_api",
+    ),
+    path("import/", views.ImportView.as_view(), name="import"),
+    path("exports/<slug:name>/", views.ExportView.as_view(), name="export"),
     path("create_product/", views.ProductCreateView.as_view(), name="create_product"),
     path("warehouses/", views.WarehouseListView.as_view(), name="warehouses"),
     path("warehouses/<int:pk>", views.WarehouseView.as_view(), name="warehouse"),
+    path("low_stock/", views.LowStockView.as_view(), name="low_stock"),
     path(
         "create_warehouse/",
         views.WarehouseCreateView.as_view(),
@@ -21,4 +49,5 @@ urlpatterns = [
     path("login/", views.LoginView.as_view(), name="login"),
     path("logout/", views.LogoutView.as_view(), name="logout"),
     path('register/', views.RegisterView.as_view(), name='register'),
+    path('metrics', views.MetricsView.as_view(), name='metrics'),
 ]
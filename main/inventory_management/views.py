@@ -1,90 +1,183 @@
+import io
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import messages
 from django.contrib.auth import login, logout
 from django.contrib.auth.forms import AuthenticationForm
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.contrib.auth.models import User
-from django.db.models import Count, Prefetch
-from django.http import HttpResponseNotAllowed
+from django.core.exceptions import BadRequest
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.db.models import (
+    F,
+    OuterRef,
+    Prefetch,
+    Subquery,
+    Sum,
+    aprefetch_related_objects,
+)
+from django.db.models.functions import Coalesce
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseForbidden,
+    HttpResponseNotAllowed,
+    JsonResponse,
+    StreamingHttpResponse,
+)
 from django.shortcuts import render, get_object_or_404, redirect
+from django.urls import reverse
 from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from django.utils.dateparse import parse_date
 from django.views import View
 
-from .models import Product, WarehouseProduct, Warehouse, Order, OrderItem
+from .models import (
+    DashboardStats,
+    Product,
+    VersionConflictError,
+    WarehouseProduct,
+    Warehouse,
+    Order,
+    OrderItem,
+)
+from .analytics import MAX_RANGE_DAYS, daily_series, year_earlier
+from .exports import EXPORTS, FORMATS, astream_export, export_filename, stream_export
 from .forms import RegisterForm
-
-
-class MainView(LoginRequiredMixin, View):
-
-    def get(self, request):
-        products_amount = Product.objects.count()
-        warehouses_amount = Warehouse.objects.count()
-        active_orders_amount = Order.objects.filter(status="Pending").count()
-        completed_orders_amount = Order.objects.filter(status="Completed").count()
-
-        most_popular_product = (
-            Product.objects.annotate(order_count=Count("orderitem"))
-            .order_by("-order_count")
-            .first()
-        )
-        if most_popular_product:
-            most_popular_quantity = most_popular_product.orderitem_set.count()
-        else:
-            most_popular_quantity = 0
-
-        now = timezone.now()
-        start_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-
-        # Создаем префетч-запрос для OrderItem, чтобы сразу получить все позиции заказа
-        order_items_prefetch = Prefetch(
-            "items", queryset=OrderItem.objects.select_related("product")
-        )
-
-        # Получаем заказы с предзагруженными данными о позициях заказов
-        orders_this_month = Order.objects.prefetch_related(order_items_prefetch).filter(
-            created_at__gte=start_of_month, status="Completed"
-        )
-
-        total_month_income = sum(order.total_price() for order in orders_this_month)
-
-        low_stock_products = WarehouseProduct.objects.filter(quantity__lt=10).count()
-
-        total_users = User.objects.count()
+from .imports import IMPORTERS
+from .fragments import aget_fragments
+from .metrics import registry
+from .pagination import apaginate, paginate
+from .sales import WINDOWS, top_products
+from .search import DEFAULT_SEARCH_LIMIT, MAX_SEARCH_LIMIT, search_products
+from .stock import (
+    InsufficientStockError,
+    StockLevelError,
+    change_item_quantity,
+    complete_orders,
+    merge_lines,
+    parse_stock_input,
+    place_order,
+    set_order_status,
+    transfer_stock,
+    update_reorder_levels,
+    update_stock_levels,
+)
+
+# Сколько последних движений товара показывать на его странице
+PRODUCT_MOVEMENTS_LIMIT = 20
+
+# Сколько ошибок импорта показывать на странице; остальные только считаются
+IMPORT_ERRORS_SHOWN = 100
+
+# Сколько заказов можно завершить одним запросом
+COMPLETE_ORDERS_MAX = 1000
+
+# Показывается, если форма перезаписала бы изменения другого пользователя
+CONFLICT_MESSAGE = (
+    "Данные успели изменить, пока открыта страница. Ниже текущие значения — "
+    "проверьте их и повторите изменение"
+)
+
+# Диапазон графика аналитики по умолчанию
+ANALYTICS_DEFAULT_DAYS = 90
+
+TOP_PRODUCTS_LIMIT = 10
+TOP_PRODUCTS_MAX_LIMIT = 100
+WINDOW_LABELS = {
+    "today": "Сегодня",
+    "7d": "7 дней",
+    "30d": "30 дней",
+    "all": "Всё время",
+}
+
+
+class AsyncLoginRequiredMixin(LoginRequiredMixin):
+    """``LoginRequiredMixin`` для асинхронных представлений.
+
+    Пользователь загружается через ``request.auser()``, а не ленивым
+    ``request.user``, который нельзя вычислять внутри цикла событий.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        request.user = await request.auser()
+        if not request.user.is_authenticated:
+            return self.handle_no_permission()
+        return await super(LoginRequiredMixin, self).dispatch(request, *args, **kwargs)
+
+
+async def arender(request, template_name, context):
+    # Шаблон рендерится в потоке запроса: это не блокирует цикл событий,
+    # а ленивые объекты контекста (сессия, сообщения) могут обращаться к БД
+    return await sync_to_async(render)(request, template_name, context)
+
+
+def _posted_version(request, name, current):
+    """Версия строки, которую видел пользователь (скрытое поле формы).
+
+    Без поля берётся ``current`` — версия, прочитанная в этом запросе.
+    """
+    raw = request.POST.get(name)
+    if raw is None:
+        return current
+    try:
+        return int(raw)
+    except ValueError:
+        raise BadRequest("Некорректная версия")
+
+
+def _conflict(view, request, pk):
+    """Страница с текущими данными и сообщением о конфликте, статус 409."""
+    messages.error(request, CONFLICT_MESSAGE)
+    response = view.get(request, pk)
+    response.status_code = 409
+    return response
+
+
+class MainView(AsyncLoginRequiredMixin, View):
+
+    async def get(self, request):
+        # Вся статистика предрассчитана и хранится в одной строке
+        stats = await DashboardStats.aload()
 
         context = {
-            "products_amount": products_amount,
-            "warehouses_amount": warehouses_amount,
-            "active_orders_amount": active_orders_amount,
-            "most_popular_product": most_popular_product,
-            "most_popular_quantity": most_popular_quantity,
-            "total_month_income": total_month_income,
-            "low_stock_products": low_stock_products,
-            "total_users": total_users,
-            "completed_orders_amount": completed_orders_amount,
+            "products_amount": stats.products_amount,
+            "warehouses_amount": stats.warehouses_amount,
+            "active_orders_amount": stats.active_orders_amount,
+            "most_popular_product": stats.most_popular_product,
+            "most_popular_quantity": stats.most_popular_quantity,
+            "total_month_income": stats.month_income,
+            "low_stock_products": stats.low_stock_products,
+            "total_users": stats.total_users,
+            "completed_orders_amount": stats.completed_orders_amount,
         }
-        return render(request, "inventory_management/main.html", context)
+        return await arender(request, "inventory_management/main.html", context)
 
 
 class OrderView(LoginRequiredMixin, View):
     def get(self, request, pk):
         order_items_prefetch = Prefetch(
-            "items", queryset=OrderItem.objects.select_related("product")
+            "items",
+            queryset=OrderItem.objects.select_related(
+                "product", "warehouse"
+            ).with_totals(),
         )
 
-        # Получаем заказы с предзагруженными данными о позициях заказов
-        order = (
-            Order.objects.prefetch_related(order_items_prefetch).filter(pk=pk).first()
+        # Получаем заказ с предзагруженными данными о позициях заказа
+        order = get_object_or_404(
+            Order.objects.prefetch_related(order_items_prefetch), pk=pk
         )
 
-        # Получаем все позиции в заказе
-        order_items = OrderItem.objects.filter(order=order)
-
         # Если нужен шаблон для просмотра заказа
         return render(
             request,
             "inventory_management/order.html",
             {
                 "order": order,
-                "order_items": order_items,
-                "total_price": order.total_price(),
+                "order_items": order.items.all(),  # Используем предзагруженные данные
+                "total_price": order.total,
             },
         )
 
@@ -94,22 +187,40 @@ class OrderView(LoginRequiredMixin, View):
 
         # В зависимости от формы вы можете менять статус или обновлять позиции
         if "update_status" in request.POST:
-            # Например, обновляем статус заказа
-            new_status = request.POST.get("status")
-            order.status = new_status
-            order.save()
+            # Смена статуса списывает или возвращает зарезервированный товар;
+            # заказ записывается, только если его не меняли после показа формы
+            order.version = _posted_version(request, "version", order.version)
+            try:
+                set_order_status(order, request.POST.get("status"))
+            except ValueError as error:
+                messages.error(request, str(error))
+            except VersionConflictError:
+                return _conflict(self, request, pk)
 
             # Перенаправляем на страницу с деталями заказа после обновления
             return redirect("inventory_management:order", pk=order.pk)
 
         elif "update_items" in request.POST:
-            # Обновляем позиции заказа (например, изменяем количество товаров)
-            for item in order.items.all():
-                new_quantity = int(
-                    request.POST.get(f"quantity_{item.pk}", item.quantity)
-                )
-                item.quantity = new_quantity
-                item.save()
+            # Обновляем позиции заказа вместе с резервом на складах
+            try:
+                with transaction.atomic():
+                    # Версия заказа гарантирует, что статус (от него зависит,
+                    # меняется резерв или остаток) не сменился после показа формы
+                    Order.claim_versions(
+                        {order.pk: _posted_version(request, "version", order.version)}
+                    )
+                    for item in order.items.select_related("product"):
+                        new_quantity = int(
+                            request.POST.get(f"quantity_{item.pk}", item.quantity)
+                        )
+                        item.version = _posted_version(
+                            request, f"version_{item.pk}", item.version
+                        )
+                        change_item_quantity(item, new_quantity)
+            except (ValueError, InsufficientStockError) as error:
+                messages.error(request, str(error))
+            except VersionConflictError:
+                return _conflict(self, request, pk)
 
             # Перенаправляем на страницу с деталями заказа после обновления
             return redirect("inventory_management:order", pk=order.pk)
@@ -117,32 +228,73 @@ class OrderView(LoginRequiredMixin, View):
         return HttpResponseNotAllowed("Метод не разрешен")
 
 
-class OrderListView(LoginRequiredMixin, View):
-    def get(self, request):
-        # Создаем префетч-запрос для OrderItem, чтобы сразу получить все позиции заказа
-        order_items_prefetch = Prefetch(
-            "items", queryset=OrderItem.objects.select_related("product")
+def _stock_version(field):
+    """Сумма версий строк остатков плюс их число: растёт при любом изменении,
+    добавлении и удалении строки (у новой строки версия может быть нулевой).
+    """
+    return Coalesce(Sum(F(field) + 1), 0)
+
+
+class OrderListView(AsyncLoginRequiredMixin, View):
+    async def get(self, request):
+        # Получаем страницу заказов (новые сверху)
+        page = await apaginate(
+            request, Order.objects.all(), ordering=("-created_at", "-id")
         )
 
-        # Получаем заказы с предзагруженными данными о позициях заказов
-        orders = Order.objects.prefetch_related(order_items_prefetch).all()
+        # Строки, уже отрендеренные в кеше, не требуют позиций заказа;
+        # для остальных позиции загружаются одним префетч-запросом. Изменение
+        # позиций пересчитывает стоимость, поэтому она входит в отметку версии
+        stamps = {order.pk: f"{order.version}:{order.total}" for order in page}
+        fragments = await aget_fragments("order", stamps)
+        missing = [order for order in page if order.pk not in fragments]
+        await aprefetch_related_objects(
+            missing,
+            Prefetch(
+                "items",
+                queryset=OrderItem.objects.select_related("product").with_totals(),
+            ),
+        )
 
         # Создаем список для отправки в шаблон
         orders_data = []
-        for order in orders:
-            order_info = {
-                "order": order,
-                "items": order.items.all(),  # Используем предзагруженные данные
-                "total_price": order.total_price(),
-            }
+        for order in page:
+            order_info = {"order": order, "stamp": stamps[order.pk]}
+            if order.pk not in fragments:
+                order_info["items"] = order.items.all()  # Предзагруженные данные
+                order_info["total_price"] = order.total  # Денормализованная стоимость
             orders_data.append(order_info)
 
         # Отправляем данные в шаблон
-        return render(
-            request, "inventory_management/orders.html", {"orders_data": orders_data}
+        return await arender(
+            request,
+            "inventory_management/orders.html",
+            {"orders_data": orders_data, "page": page, "fragments": fragments},
         )
 
 
+class OrderCompleteView(LoginRequiredMixin, View):
+    def post(self, request):
+        # Выбранные в списке заказы завершаются одной транзакцией
+        try:
+            order_ids = {int(pk) for pk in request.POST.getlist("order_ids")}
+        except ValueError:
+            raise BadRequest("Некорректный номер заказа")
+        if len(order_ids) > COMPLETE_ORDERS_MAX:
+            raise BadRequest(f"Можно завершить не больше {COMPLETE_ORDERS_MAX} заказов")
+
+        if not order_ids:
+            messages.error(request, "Не выбрано ни одного заказа")
+        else:
+            try:
+                completed = complete_orders(order_ids)
+            except StockLevelError as error:
+                messages.error(request, str(error))
+            else:
+                messages.success(request, f"Завершено заказов: {completed}")
+        return redirect("inventory_management:orders")
+
+
 class ProductView(LoginRequiredMixin, View):
     def get(self, request, pk):
         # Получаем продукт по первичному ключу (pk) или возвращаем 404, если продукт не найден
@@ -160,6 +312,11 @@ class ProductView(LoginRequiredMixin, View):
 
         warehouses = Warehouse.objects.all()
 
+        # Последние движения товара из журнала
+        movements = product.stock_movements.select_related("warehouse").order_by(
+            "-created_at", "-id"
+        )[:PRODUCT_MOVEMENTS_LIMIT]
+
         # Отправляем данные в шаблон
         return render(
             request,
@@ -169,6 +326,7 @@ class ProductView(LoginRequiredMixin, View):
                 "warehouse_products": warehouse_products,
                 "total_quantity": total_quantity,
                 "warehouses": warehouses,
+                "movements": movements,
             },
         )
 
@@ -178,15 +336,47 @@ class ProductView(LoginRequiredMixin, View):
 
         # Обрабатываем изменение количества товара на складе
         if "update_quantity" in request.POST:
-            for warehouse_product in product.warehouse_products.all():
-                # Изменяем количество товара на складе
-                new_quantity = int(
-                    request.POST.get(
-                        f"quantity_{warehouse_product.pk}", warehouse_product.quantity
+            # Собираем только изменённые строки: "12" — новое значение,
+            # "+5" / "-3" — изменение относительно текущего остатка
+            try:
+                changes = {}
+                levels = {}
+                versions = {}
+                for warehouse_product in product.warehouse_products.all():
+                    change = parse_stock_input(
+                        request.POST.get(f"quantity_{warehouse_product.pk}"),
+                        warehouse_product.quantity,
                     )
-                )
-                warehouse_product.quantity = new_quantity
-                warehouse_product.save()
+                    if change:
+                        changes[warehouse_product.pk] = change
+
+                    # Порог низкого запаса для этой пары склад/продукт
+                    level = request.POST.get(f"reorder_level_{warehouse_product.pk}")
+                    if level and int(level) != warehouse_product.reorder_level:
+                        if int(level) < 0:
+                            raise ValueError("Порог не может быть отрицательным")
+                        levels[warehouse_product.pk] = int(level)
+
+                    # Абсолютные значения перезаписывают строку, поэтому она не
+                    # должна меняться после показа формы; «+5» и «−3» складываются
+                    # с параллельными изменениями и версию не проверяют
+                    overwrites = change is not None and change[0] == "set"
+                    if overwrites or warehouse_product.pk in levels:
+                        versions[warehouse_product.pk] = _posted_version(
+                            request,
+                            f"version_{warehouse_product.pk}",
+                            warehouse_product.version,
+                        )
+
+                # Все изменения записываются одним UPDATE в транзакции
+                with transaction.atomic():
+                    WarehouseProduct.claim_versions(versions)
+                    update_stock_levels(changes)
+                    update_reorder_levels(levels)
+            except (ValueError, StockLevelError) as error:
+                messages.error(request, str(error))
+            except VersionConflictError:
+                return _conflict(self, request, pk)
 
             # Перенаправляем на страницу с деталями продукта после обновления
             return redirect("inventory_management:product", pk=product.pk)
@@ -209,48 +399,90 @@ class ProductView(LoginRequiredMixin, View):
             # Получаем склад по ID
             warehouse = get_object_or_404(Warehouse, pk=warehouse_id)
 
-            # Создаем новую запись WarehouseProduct
-            WarehouseProduct.objects.create(
-                product=product, warehouse=warehouse, quantity=quantity
-            )
+            # Создаем новую запись WarehouseProduct; у продукта на складе
+            # может быть только одна строка остатка
+            if WarehouseProduct.objects.filter(
+                product=product, warehouse=warehouse
+            ).exists():
+                messages.error(request, f"Продукт уже есть на складе «{warehouse}»")
+            else:
+                WarehouseProduct.objects.create(
+                    product=product, warehouse=warehouse, quantity=quantity
+                )
 
             # Перенаправляем на страницу с деталями продукта после добавления склада
             return redirect("inventory_management:product", pk=product.pk)
 
+        elif "transfer_stock" in request.POST:
+            # Перемещение товара между складами записывается в журнал
+            source = get_object_or_404(
+                WarehouseProduct, pk=request.POST.get("source"), product=product
+            )
+            warehouse = get_object_or_404(Warehouse, pk=request.POST.get("target"))
+            try:
+                transfer_stock(
+                    source, warehouse, int(request.POST.get("transfer_quantity"))
+                )
+            except (ValueError, TypeError, InsufficientStockError) as error:
+                messages.error(request, str(error))
+
+            return redirect("inventory_management:product", pk=product.pk)
+
         return HttpResponseNotAllowed("Метод не разрешен")
 
 
-class ProductListView(LoginRequiredMixin, View):
-    def get(self, request):
-        # Создаем префетч-запрос для WarehouseProduct, чтобы сразу получить все продукты на складах
-        warehouse_products_prefetch = Prefetch(
-            "warehouse_products",
-            queryset=WarehouseProduct.objects.select_related("warehouse"),
+class ProductListView(AsyncLoginRequiredMixin, View):
+    async def get(self, request):
+        # Получаем страницу продуктов; остатки выводятся в строке продукта,
+        # поэтому их версии входят в отметку версии строки
+        stock_version = (
+            WarehouseProduct.objects.filter(product=OuterRef("pk"))
+            .order_by()
+            .values("product")
+            .annotate(version=_stock_version("version"))
+            .values("version")
+        )
+        page = await apaginate(
+            request,
+            Product.objects.annotate(stock_version=Subquery(stock_version)),
+            ordering=("id",),
         )
 
-        # Получаем все продукты с предзагруженными данными о складах
-        products = Product.objects.prefetch_related(warehouse_products_prefetch).all()
+        # Остатки по складам загружаются только для строк, которых нет в кеше
+        stamps = {
+            product.pk: f"{product.updated_at.isoformat()}:{product.stock_version}"
+            for product in page
+        }
+        fragments = await aget_fragments("product", stamps)
+        missing = [product for product in page if product.pk not in fragments]
+        await aprefetch_related_objects(
+            missing,
+            Prefetch(
+                "warehouse_products",
+                queryset=WarehouseProduct.objects.select_related("warehouse"),
+            ),
+        )
 
         # Создаем список для отправки в шаблон
         products_data = []
-        for product in products:
-            product_info = {
-                "product": product,
-                "warehouses": product.warehouse_products.all(),
+        for product in page:
+            product_info = {"product": product, "stamp": stamps[product.pk]}
+            if product.pk not in fragments:
                 # Используем предзагруженные данные
-                "total_quantity": sum(
-                    warehouse_product.quantity
-                    for warehouse_product in product.warehouse_products.all()
-                ),
+                warehouse_products = product.warehouse_products.all()
+                product_info["warehouses"] = warehouse_products
                 # Сумма всех количеств товара на складах
-            }
+                product_info["total_quantity"] = sum(
+                    warehouse_product.quantity
+                    for warehouse_product in warehouse_products
+                )
             products_data.append(product_info)
 
         # Отправляем данные в шаблон
-        return render(
+        return await arender(
             request,
             "inventory_management/products.html",
-            {"products_data": products_data},
+            {"products_data": products_data, "page": page, "fragments": fragments},
         )
 
 
@@ -274,10 +506,14 @@ class WarehouseView(LoginRequiredMixin, View):
             new_name = request.POST.get("name")
             new_location = request.POST.get("location")
 
-            # Обновляем данные о складе
+            # Обновляем данные о складе, если их не меняли после показа формы
+            warehouse.version = _posted_version(request, "version", warehouse.version)
             warehouse.name = new_name
             warehouse.location = new_location
-            warehouse.save()
+            try:
+                warehouse.save()
+            except VersionConflictError:
+                return _conflict(self, request, pk)
 
             # Перенаправляем на страницу с деталями склада после обновления
             return redirect("inventory_management:warehouse", pk=warehouse.pk)
@@ -285,33 +521,261 @@ class WarehouseView(LoginRequiredMixin, View):
         return HttpResponseNotAllowed("Метод не разрешен")
 
 
-class WarehouseListView(LoginRequiredMixin, View):
-    def get(self, request):
-        # Получаем все склады и предзагружаем данные о продуктах на складах
-        warehouses = Warehouse.objects.all()
+class WarehouseListView(AsyncLoginRequiredMixin, View):
+    async def get(self, request):
+        # Итоги по остаткам считаются в БД одним GROUP BY запросом
+        page = await apaginate(
+            request,
+            Warehouse.objects.with_stock_totals().annotate(
+                stock_version=_stock_version("warehouse_products__version")
+            ),
+            ordering=("id",),
+        )
 
-        # Для каждого склада получаем его продукты и количество
-        warehouses_data = []
-        for warehouse in warehouses:
-            warehouse_products = WarehouseProduct.objects.filter(
-                warehouse=warehouse
-            ).select_related("product")
-            warehouses_data.append(
-                {
-                    "warehouse": warehouse,
-                    "warehouse_products": warehouse_products,
-                    "total_quantity": sum(
-                        warehouse_product.quantity
-                        for warehouse_product in warehouse_products
-                    ),
-                }
+        # Продукты складов загружаются одним префетч-запросом и только
+        # для строк, которых нет в кеше. В отметку версии строки входят
+        # версии остатков склада и их стоимость (она меняется вместе с ценами)
+        stamps = {
+            warehouse.pk: (
+                f"{warehouse.version}:{warehouse.stock_version}:{warehouse.stock_value}"
             )
+            for warehouse in page
+        }
+        fragments = await aget_fragments("warehouse", stamps)
+        missing = [warehouse for warehouse in page if warehouse.pk not in fragments]
+        await aprefetch_related_objects(
+            missing,
+            Prefetch(
+                "warehouse_products",
+                queryset=WarehouseProduct.objects.select_related("product"),
+            ),
+        )
+
+        warehouses_data = []
+        for warehouse in page:
+            warehouse_info = {"warehouse": warehouse, "stamp": stamps[warehouse.pk]}
+            if warehouse.pk not in fragments:
+                warehouse_info.update(
+                    {
+                        # Используем предзагруженные данные
+                        "warehouse_products": warehouse.warehouse_products.all(),
+                        "total_quantity": warehouse.total_quantity,
+                        "sku_count": warehouse.sku_count,
+                        "stock_value": warehouse.stock_value,
+                    }
+                )
+            warehouses_data.append(warehouse_info)
 
         # Отправляем данные в шаблон
-        return render(
+        return await arender(
             request,
             "inventory_management/warehouses.html",
-            {"warehouses_data": warehouses_data},
+            {"warehouses_data": warehouses_data, "page": page, "fragments": fragments},
+        )
+
+
+class LowStockView(LoginRequiredMixin, View):
+    def get(self, request):
+        # Отчёт читает только строки с флагом is_low_stock по частичному индексу
+        low_stock = WarehouseProduct.objects.filter(is_low_stock=True).select_related(
+            "warehouse", "product"
+        )
+        warehouse_id = request.GET.get("warehouse")
+        if warehouse_id:
+            low_stock = low_stock.filter(warehouse_id=warehouse_id)
+
+        page = paginate(request, low_stock, ordering=("id",))
+
+        return render(
+            request,
+            "inventory_management/low_stock.html",
+            {
+                "page": page,
+                "warehouses": Warehouse.objects.all(),
+                "selected_warehouse": warehouse_id,
+            },
+        )
+
+
+class TopProductsView(LoginRequiredMixin, View):
+    def get(self, request):
+        # Рейтинг читается из предрассчитанных продаж, а не из истории заказов
+        window = request.GET.get("window", "30d")
+        if window not in WINDOWS:
+            raise BadRequest(f"Неизвестный период: {window}")
+        try:
+            limit = int(request.GET.get("limit", TOP_PRODUCTS_LIMIT))
+        except ValueError:
+            raise BadRequest("Некорректный параметр limit")
+        limit = min(max(limit, 1), TOP_PRODUCTS_MAX_LIMIT)
+
+        return render(
+            request,
+            "inventory_management/top_products.html",
+            {
+                "products": top_products(window, limit),
+                "windows": WINDOW_LABELS,
+                "selected_window": window,
+                "limit": limit,
+            },
+        )
+
+
+def _analytics_params(request):
+    """Диапазон и фильтры графика из параметров запроса.
+
+    По умолчанию — последние 90 дней по всем статусам и складам.
+    """
+    today = timezone.localdate()
+    days = {}
+    for name, default in (("end", today), ("start", None)):
+        value = request.GET.get(name)
+        if not value:
+            days[name] = default
+            continue
+        try:
+            days[name] = parse_date(value)
+        except ValueError:
+            days[name] = None
+        if days[name] is None:
+            raise BadRequest(f"Некорректная дата {name}: {value}")
+    end = days["end"]
+    start = days["start"] or end - timedelta(days=ANALYTICS_DEFAULT_DAYS - 1)
+    if start > end:
+        raise BadRequest("Начало диапазона позже конца")
+    if (end - start).days >= MAX_RANGE_DAYS:
+        raise BadRequest(f"Диапазон длиннее {MAX_RANGE_DAYS} дней")
+
+    status = request.GET.get("status") or None
+    if status and status not in dict(Order._meta.get_field("status").choices):
+        raise BadRequest(f"Неизвестный статус заказа: {status}")
+    warehouse_id = request.GET.get("warehouse") or None
+    if warehouse_id is not None:
+        try:
+            warehouse_id = int(warehouse_id)
+        except ValueError:
+            raise BadRequest(f"Некорректный параметр warehouse: {warehouse_id}")
+    return start, end, status, warehouse_id
+
+
+class AnalyticsView(LoginRequiredMixin, View):
+    def get(self, request):
+        # Данные графика загружаются из AnalyticsApiView
+        start, end, status, warehouse_id = _analytics_params(request)
+        return render(
+            request,
+            "inventory_management/analytics.html",
+            {
+                "start": start,
+                "end": end,
+                "status": status,
+                "statuses": Order._meta.get_field("status").choices,
+                "warehouse_id": warehouse_id,
+                "warehouses": Warehouse.objects.only("name").order_by("name"),
+                "compare": request.GET.get("compare") == "year",
+            },
+        )
+
+
+class AnalyticsApiView(LoginRequiredMixin, View):
+    raise_exception = True
+
+    def get(self, request):
+        # Читаются только дневные итоги диапазона, а не заказы
+        start, end, status, warehouse_id = _analytics_params(request)
+        data = {"start": start, "end": end}
+        data.update(daily_series(start, end, status, warehouse_id))
+        if request.GET.get("compare") == "year":
+            previous_start, previous_end = year_earlier(start), year_earlier(end)
+            data["previous"] = {"start": previous_start, "end": previous_end}
+            data["previous"].update(
+                daily_series(previous_start, previous_end, status, warehouse_id)
+            )
+        return JsonResponse(data)
+
+
+class ProductSearchView(LoginRequiredMixin, View):
+    def get(self, request):
+        # Поиск идёт по полнотекстовому индексу, результаты ранжированы
+        query = request.GET.get("q", "").strip()
+        return render(
+            request,
+            "inventory_management/product_search.html",
+            {"query": query, "products": search_products(query)},
+        )
+
+
+class ProductSearchApiView(LoginRequiredMixin, View):
+    def get(self, request):
+        # Подсказки для поля поиска и выбор продуктов в форме заказа: запрос
+        # выполняется на каждое нажатие клавиши
+        try:
+            limit = int(request.GET.get("limit", DEFAULT_SEARCH_LIMIT))
+        except ValueError:
+            raise BadRequest("Некорректный параметр limit")
+        limit = min(max(limit, 1), MAX_SEARCH_LIMIT)
+        products = search_products(request.GET.get("q", ""), limit)
+        return JsonResponse(
+            {
+                "results": [
+                    {
+                        "id": product.pk,
+                        "name": product.name,
+                        "price": str(product.price),
+                        "url": reverse(
+                            "inventory_management:product", args=[product.pk]
+                        ),
+                    }
+                    for product in products
+                ]
+            }
+        )
+
+
+class ExportView(AsyncLoginRequiredMixin, View):
+    async def get(self, request, name):
+        # Выгрузка читается из БД пачками прямо во время отдачи ответа
+        if name not in EXPORTS:
+            raise Http404("Неизвестная выгрузка")
+        export_format = request.GET.get("format", "csv")
+        if export_format not in FORMATS:
+            raise BadRequest(f"Неизвестный формат выгрузки: {export_format}")
+        compress = request.GET.get("gzip") == "1"
+
+        # Под ASGI пачки читаются асинхронным итератором, и цикл событий
+        # свободен между ними; синхронный итератор Django собрал бы весь ответ
+        # в память. Под WSGI, наоборот, нужен синхронный итератор
+        if isinstance(request, ASGIRequest):
+            content = astream_export(name, export_format, compress)
+        else:
+            content = stream_export(name, export_format, compress)
+        response = StreamingHttpResponse(
+            content,
+            content_type="application/gzip" if compress else FORMATS[export_format][0],
+        )
+        filename = export_filename(name, export_format, compress)
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+
+class ImportView(LoginRequiredMixin, View):
+    def get(self, request):
+        return render(request, "inventory_management/import.html")
+
+    def post(self, request):
+        # Файл проверяется и записывается пачками; строки с ошибками
+        # пропускаются и перечисляются в отчёте
+        importer = IMPORTERS.get(request.POST.get("kind"))
+        upload = request.FILES.get("file")
+        if importer is None or upload is None:
+            raise BadRequest("Нужны тип импорта и CSV-файл")
+        report = importer(
+            io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+        )
+        return render(
+            request,
+            "inventory_management/import.html",
+            {"report": report, "errors": report.errors[:IMPORT_ERRORS_SHOWN]},
         )
 
 
@@ -336,10 +800,8 @@ class ProductCreateView(LoginRequiredMixin, View):
 
 class OrderCreateView(LoginRequiredMixin, View):
     def get(self, request):
-        products = Product.objects.all()  # Получаем все продукты
-        return render(
-            request, "inventory_management/order_create.html", {"products": products}
-        )
+        # Продукты подбираются в форме через API поиска, каталог не загружается
+        return render(request, "inventory_management/order_create.html")
 
     def post(self, request):
         # Получаем данные из формы
@@ -347,15 +809,13 @@ class OrderCreateView(LoginRequiredMixin, View):
         quantities = request.POST.getlist("quantities")  # Список количеств товаров
 
         if product_ids and quantities:
-            # Создаем новый заказ
-            order = Order.objects.create(status="Pending")
-
-            # Добавляем товары в заказ
-            for product_id, quantity in zip(product_ids, quantities):
-                product = Product.objects.get(id=product_id)
-                OrderItem.objects.create(
-                    order=order, product=product, quantity=quantity
-                )
+            try:
+                lines = merge_lines(product_ids, quantities)
+                # Заказ создаётся в одной транзакции вместе с резервом на складах
+                order = place_order(lines)
+            except (ValueError, Product.DoesNotExist, InsufficientStockError) as error:
+                messages.error(request, str(error))
+                return redirect("inventory_management:create_order")
 
             return redirect("inventory_management:order", pk=order.pk)
 
@@ -431,3 +891,20 @@ class LogoutView(View):
     def get(self, request):
         logout(request)
         return redirect("inventory_management:login")
+
+
+class MetricsView(View):
+    def get(self, request):
+        # Метрики доступны персоналу и сборщику Prometheus с токеном
+        # из INVENTORY_METRICS_TOKEN (заголовок Authorization: Bearer ...)
+        token = getattr(settings, "INVENTORY_METRICS_TOKEN", "")
+        scheme, _, credentials = request.headers.get("Authorization", "").partition(" ")
+        if not request.user.is_staff and not (
+            token
+            and scheme.lower() == "bearer"
+            and constant_time_compare(credentials.strip(), token)
+        ):
+            return HttpResponseForbidden("Доступ запрещён")
+        return HttpResponse(
+            registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+        )